@@ -74,6 +74,11 @@ def readCommand(argv):
                       dest='noGraphics',
                       action='store_true',
                       help='No graphics display for pacman games.')
+    parser.add_option('--jobs', '-j',
+                      dest='jobs',
+                      type='int',
+                      default=1,
+                      help='Number of processes to run test cases in.')
     (options, args) = parser.parse_args(argv)
     return options
 
@@ -178,13 +183,137 @@ def getTestSubdirs(testParser, testRoot, questionToGrade):
     return sorted(os.listdir(testRoot))
 
 
+# Test cases waiting to be run by a worker process.  Workers are forked, so
+# they inherit these (and the loaded student modules) instead of pickling them.
+_PARALLEL_TESTS = []
+
+
+class RecordingGrades:
+    """
+    Stands in for grading.Grades inside a worker process.  It records every
+    call a test case makes, together with the output printed before it, so
+    that replay() can repeat them on the real Grades object in order.
+    """
+    def __init__(self, output):
+        self.output = output
+        self.log = []
+
+    def flushOutput(self):
+        text = self.output.getvalue()
+        if text:
+            self.log.append(('output', text))
+            self.output.seek(0)
+            self.output.truncate()
+
+    def __getattr__(self, name):
+        def record(*args, **kwargs):
+            self.flushOutput()
+            self.log.append(('call', (name, args, kwargs)))
+        return record
+
+    def replay(log, grades):
+        for kind, entry in log:
+            if kind == 'output':
+                sys.stdout.write(entry)
+            else:
+                name, args, kwargs = entry
+                getattr(grades, name)(*args, **kwargs)
+    replay = staticmethod(replay)
+
+
+class ParallelTestError(Exception):
+    """
+    Raised by ParallelTestRunner.collect in place of the exception a test
+    case raised in a worker, which may not survive pickling.  It has the
+    same message, and carries the type and traceback of the original for
+    Grades.addExceptionMessage and Grades.addErrorHints.
+    """
+    def __init__(self, message, typeName, tracebackText):
+        Exception.__init__(self, message)
+        self.typeName = typeName
+        self.tracebackText = tracebackText
+
+
+def runParallelTest(index):
+    """
+    Runs _PARALLEL_TESTS[index] in a worker and returns (result, log, error),
+    where log is the RecordingGrades log and error None, or the (message,
+    type, traceback) strings of the exception raised.
+    """
+    import io
+    import traceback
+    testCase, moduleDict, testDict, solutionDict, printTestCase = _PARALLEL_TESTS[index]
+    output = io.StringIO()
+    grades = RecordingGrades(output)
+    oldStdout = sys.stdout
+    sys.stdout = output
+    result, error = None, None
+    try:
+        if printTestCase:
+            printTest(testDict, solutionDict)
+        result = testCase.execute(grades, moduleDict, solutionDict)
+    except Exception as inst:
+        error = (str(inst), str(type(inst)), traceback.format_exc())
+    finally:
+        sys.stdout = oldStdout
+    grades.flushOutput()
+    return result, grades.log, error
+
+
+class ParallelTestRunner:
+    """
+    Runs the test cases of evaluate() in a pool of forked processes.  A
+    question's tests are submitted as soon as the pool starts unless the
+    question depends on another one, in which case they are submitted when
+    the question starts grading; by then its prerequisites have been graded,
+    and a question whose prerequisites failed is skipped without running
+    its tests.  Results are replayed into the grades in the usual order.
+    """
+    def __init__(self, jobs):
+        self.jobs = jobs
+        self.pool = None
+        self.pending = {}   # question -> indices into _PARALLEL_TESTS
+        self.results = {}   # index -> AsyncResult
+
+    def start(self, questions):
+        "Forks the workers once every test case has been added."
+        import multiprocessing
+        self.pool = multiprocessing.get_context('fork').Pool(self.jobs)
+        for q in questions:
+            self.submit(q)
+
+    def addTestCase(self, question, testCase, moduleDict, testDict, solutionDict, printTestCase):
+        _PARALLEL_TESTS.append((testCase, moduleDict, testDict, solutionDict, printTestCase))
+        index = len(_PARALLEL_TESTS) - 1
+        self.pending.setdefault(question, []).append(index)
+        return lambda grades: self.collect(index, grades)
+
+    def submit(self, question):
+        for index in self.pending.pop(question, []):
+            self.results[index] = self.pool.apply_async(runParallelTest, (index,))
+
+    def collect(self, index, grades):
+        result, log, error = self.results.pop(index).get()
+        RecordingGrades.replay(log, grades)
+        if error is not None:
+            raise ParallelTestError(*error)
+        return result
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.terminate()
+        del _PARALLEL_TESTS[:]
+
+
 def evaluate(generateSolutions, testRoot, moduleDict, exceptionMap=ERROR_HINT_MAP, edxOutput=False, muteOutput=False,
-            printTestCase=False, questionToGrade=None, display=None):
+            printTestCase=False, questionToGrade=None, display=None, jobs=1):
     import testParser
     import testClasses
     for module in moduleDict:
         setattr(sys.modules[__name__], module, moduleDict[module])
 
+    # Solutions are written by the parent process, so only grading runs in parallel
+    runner = ParallelTestRunner(jobs) if jobs > 1 and not generateSolutions else None
     questions = []
     questionDicts = {}
     test_subdirs = getTestSubdirs(testParser, testRoot, questionToGrade)
@@ -211,6 +340,10 @@ def evaluate(generateSolutions, testRoot, moduleDict, exceptionMap=ERROR_HINT_MA
             testClass = getattr(projectTestClasses, testDict['class'])
             testCase = testClass(question, testDict)
             def makefun(testCase, solution_file):
+                if runner is not None:
+                    testDict = testParser.TestParser(test_file).parse()
+                    solutionDict = testParser.TestParser(solution_file).parse()
+                    return runner.addTestCase(q, testCase, moduleDict, testDict, solutionDict, printTestCase)
                 if generateSolutions:
                     return lambda grades: testCase.writeSolution(moduleDict, solution_file)
                 else:
@@ -222,9 +355,11 @@ def evaluate(generateSolutions, testRoot, moduleDict, exceptionMap=ERROR_HINT_MA
                         return lambda grades: testCase.execute(grades, moduleDict, solutionDict)
             question.addTestCase(testCase, makefun(testCase, solution_file))
 
-        def makefun(question):
+        def makefun(question, q):
+            if runner is not None:
+                return lambda grades: runner.submit(q) or question.execute(grades)
             return lambda grades: question.execute(grades)
-        setattr(sys.modules[__name__], q, makefun(question))
+        setattr(sys.modules[__name__], q, makefun(question, q))
         questions.append((q, question.getMaxPoints()))
 
     grades = grading.Grades(projectParams.PROJECT_NAME, questions, edxOutput=edxOutput, muteOutput=muteOutput)
@@ -233,7 +368,13 @@ def evaluate(generateSolutions, testRoot, moduleDict, exceptionMap=ERROR_HINT_MA
             for prereq in questionDicts[q].get("depends", "").split():
                 grades.addPrereq(q, prereq)
 
-    grades.grade(sys.modules[__name__], bonusPic=projectParams.BONUS_PIC)
+    try:
+        if runner is not None:
+            runner.start([q for q in questionDicts if not questionDicts[q].get('depends', '').split()])
+        grades.grade(sys.modules[__name__], bonusPic=projectParams.BONUS_PIC)
+    finally:
+        if runner is not None:
+            runner.close()
     return grades.points
 
 
@@ -256,4 +397,5 @@ if __name__ == '__main__':
     else:
         evaluate(options.generateSolutions, options.testRoot, moduleDict,
                  edxOutput=options.edxOutput, muteOutput=options.muteOutput,
-                 printTestCase=options.printTestCase, questionToGrade=options.gradeQuestion)
+                 printTestCase=options.printTestCase, questionToGrade=options.gradeQuestion,
+                 jobs=options.jobs)
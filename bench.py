@@ -0,0 +1,216 @@
+# bench.py
+# --------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+bench.py plays headless games over a matrix of Pacman agents, search depths,
+layouts and ghost types, and reports how fast the agents search:
+
+  nodes         nodes searched per game: those of the agent's SearchCounters
+                (multiAgents), else the states in GameState.explored
+  nodes/s       nodes searched per second of Pacman thinking time
+  p50/p95/max   seconds Pacman spent on a single move
+  rss           peak resident memory of the process that ran the games (MB)
+  win rate      fraction of games won
+
+Every configuration plays the same seeded games in a fresh process, so the
+numbers can be compared between runs to catch regressions.
+
+  python bench.py -p AlphaBetaAgent,ExpectimaxAgent -d 2,3 -l smallClassic -n 3
+"""
+from pacman import GameState
+from pacman import ClassicGameRules
+import pacman
+import layout
+import json
+import multiprocessing
+import random
+import resource
+import sys
+import time
+
+class BenchmarkAgent:
+    """
+    Wraps the Pacman agent being measured and records, for every move, the
+    time it took and how many nodes it searched.  The search agents of
+    multiAgents count their nodes themselves (getMoveCounters), including
+    those searched with doMove/undoMove or by worker processes; for other
+    agents the states in GameState.explored are counted.  GameState.explored
+    is reset after each move so that it does not grow over a whole game.
+    """
+    def __init__(self, agent):
+        self.agent = agent
+        self.index = 0
+        self.moveTimes = []
+        self.nodes = 0
+
+    def registerInitialState(self, state):
+        if 'registerInitialState' in dir(self.agent):
+            self.agent.registerInitialState(state)
+        GameState.getAndResetExplored()
+
+    def getAction(self, state):
+        start = time.perf_counter()
+        action = self.agent.getAction(state)
+        self.moveTimes.append(time.perf_counter() - start)
+        if 'getMoveCounters' in dir(self.agent):
+            self.nodes += self.agent.getMoveCounters().getNodes()
+            GameState.explored = set()
+        else:
+            self.nodes += len(GameState.getAndResetExplored())
+        return action
+
+    def final(self, state):
+        if 'final' in dir(self.agent):
+            self.agent.final(state)
+
+class NullDisplay:
+    "Shows nothing; textDisplay.NullGraphics without the textDisplay module, which is still Python 2."
+    def initialize(self, state, isBlue=False):
+        pass
+
+    def update(self, state):
+        pass
+
+    def checkNullDisplay(self):
+        return True
+
+    def finish(self):
+        pass
+
+def percentile(values, fraction):
+    "Nearest-rank percentile of a non-empty list."
+    ordered = sorted(values)
+    rank = max(0, int(round(fraction * len(ordered) + 0.5)) - 1)
+    return ordered[min(rank, len(ordered) - 1)]
+
+def runConfiguration(config):
+    """
+    Plays config['numGames'] seeded games of one configuration and returns
+    its result record.  Runs in a worker process of its own.
+    """
+    agentType = pacman.loadAgent(config['agent'], True)
+    agentArgs = pacman.parseAgentArgs(config['agentArgs'])
+    if config['depth'] is not None:
+        agentArgs['depth'] = str(config['depth'])
+    ghostType = pacman.loadAgent(config['ghost'], True)
+    lay = layout.getLayout(config['layout'])
+    lay.getDistanceTable() # Build (or map) the distance table outside the timed moves
+
+    rules = ClassicGameRules(config['timeout'])
+    wins, scores, nodes, moveTimes = 0, [], 0, []
+    for game in range(config['numGames']):
+        random.seed('%s-%d' % (config['seed'], game))
+        bench = BenchmarkAgent(agentType(**agentArgs))
+        ghosts = [ghostType(i + 1) for i in range(config['numGhosts'])]
+        game = rules.newGame(lay, bench, ghosts, NullDisplay(), True)
+        game.run()
+        wins += game.state.isWin()
+        scores.append(game.state.getScore())
+        nodes += bench.nodes
+        moveTimes.extend(bench.moveTimes)
+
+    thinkingTime = sum(moveTimes)
+    record = dict(config)
+    del record['timeout']
+    record.update({
+        'games': config['numGames'],
+        'winRate': wins / float(config['numGames']),
+        'averageScore': sum(scores) / float(len(scores)),
+        'moves': len(moveTimes),
+        'nodesPerGame': nodes / float(config['numGames']),
+        'nodesPerSecond': nodes / thinkingTime if thinkingTime > 0 else 0.0,
+        'moveTimeP50': percentile(moveTimes, 0.50) if moveTimes else 0.0,
+        'moveTimeP95': percentile(moveTimes, 0.95) if moveTimes else 0.0,
+        'moveTimeMax': max(moveTimes) if moveTimes else 0.0,
+        # ru_maxrss is in kilobytes on Linux (and bytes on macOS)
+        'peakRssMB': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0 / (1024.0 if sys.platform == 'darwin' else 1.0),
+    })
+    return record
+
+def formatTable(records):
+    columns = [('agent', '%s'), ('depth', '%s'), ('layout', '%s'), ('ghost', '%s'),
+               ('nodesPerGame', '%.0f'), ('nodesPerSecond', '%.0f'), ('moveTimeP50', '%.4f'),
+               ('moveTimeP95', '%.4f'), ('moveTimeMax', '%.4f'), ('peakRssMB', '%.1f'), ('winRate', '%.2f')]
+    headers = ['agent', 'depth', 'layout', 'ghost', 'nodes', 'nodes/s', 'p50', 'p95', 'max', 'rss', 'win rate']
+    rows = [headers] + [[fmt % (r[key] if r[key] is not None else '-') for key, fmt in columns] for r in records]
+    widths = [max(len(row[i]) for row in rows) for i in range(len(headers))]
+    lines = ['  '.join(cell.ljust(width) for cell, width in zip(row, widths)) for row in rows]
+    lines.insert(1, '  '.join('-' * width for width in widths))
+    return '\n'.join(lines)
+
+def readCommand(argv):
+    from optparse import OptionParser
+    parser = OptionParser(__doc__)
+    parser.add_option('-p', '--agents', dest='agents', default='ReflexAgent,MinimaxAgent,AlphaBetaAgent,ExpectimaxAgent',
+                      help=pacman.default('comma separated Pacman agent TYPES'))
+    parser.add_option('-d', '--depths', dest='depths', default='2',
+                      help=pacman.default('comma separated search depths (not used for agents without one)'))
+    parser.add_option('-l', '--layouts', dest='layouts', default='smallClassic,mediumClassic',
+                      help=pacman.default('comma separated layouts from layouts/'))
+    parser.add_option('-g', '--ghosts', dest='ghosts', default='RandomGhost,DirectionalGhost',
+                      help=pacman.default('comma separated ghost agent TYPES'))
+    parser.add_option('-k', '--numghosts', type='int', dest='numGhosts', default=2,
+                      help=pacman.default('the number of ghosts'))
+    parser.add_option('-n', '--numGames', type='int', dest='numGames', default=3,
+                      help=pacman.default('games per configuration'))
+    parser.add_option('-a', '--agentArgs', dest='agentArgs', default=None,
+                      help='Comma separated values sent to every Pacman agent, e.g. "evalFn=better,ttSize=100000"')
+    parser.add_option('--seed', dest='seed', default='0',
+                      help=pacman.default('seed the games are derived from'))
+    parser.add_option('--timeout', type='int', dest='timeout', default=30,
+                      help=pacman.default('the rules\' per-move timeout'))
+    parser.add_option('--workers', type='int', dest='workers', default=1,
+                      help=pacman.default('configurations to run at once (timings are noisier above 1)'))
+    parser.add_option('--json', dest='jsonFile', default=None,
+                      help='Write the results to this file as JSON')
+    options, otherjunk = parser.parse_args(argv)
+    if len(otherjunk) != 0:
+        raise Exception('Command line input not understood: ' + str(otherjunk))
+    return options
+
+def getConfigurations(options):
+    import multiAgents
+    configs = []
+    for agent in options.agents.split(','):
+        agentType = pacman.loadAgent(agent, True)
+        searches = issubclass(agentType, multiAgents.MultiAgentSearchAgent)
+        depths = [int(d) for d in options.depths.split(',')] if searches else [None]
+        for depth in depths:
+            for layoutName in options.layouts.split(','):
+                for ghost in options.ghosts.split(','):
+                    configs.append({'agent': agent, 'depth': depth, 'layout': layoutName, 'ghost': ghost,
+                                    'numGhosts': options.numGhosts, 'numGames': options.numGames,
+                                    'agentArgs': options.agentArgs, 'seed': options.seed,
+                                    'timeout': options.timeout})
+    return configs
+
+def runBenchmarks(configs, workers=1):
+    """
+    Runs every configuration in a fresh worker process (so that its peak
+    memory is its own) and returns the result records in order.
+    """
+    pool = multiprocessing.Pool(workers, maxtasksperchild=1)
+    try:
+        return pool.map(runConfiguration, configs, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+if __name__ == '__main__':
+    options = readCommand(sys.argv[1:])
+    records = runBenchmarks(getConfigurations(options), options.workers)
+    print(formatTable(records))
+    if options.jsonFile:
+        with open(options.jsonFile, 'w') as f:
+            json.dump(records, f, indent=2)
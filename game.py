@@ -24,6 +24,7 @@ from util import *
 import time, os
 import traceback
 import sys
+import hashlib
 
 #######################
 # Parts worth reading #
@@ -75,6 +76,7 @@ class Configuration:
     The convention for positions, like a graph, is that (0,0) is the lower left corner, x increases
     horizontally and y increases vertically.  Therefore, north is the direction of increasing y, or (0,1).
     """
+    __slots__ = ('pos', 'direction')
 
     def __init__(self, pos, direction):
         self.pos = pos
@@ -190,6 +192,7 @@ class Grid:
 
     def __eq__(self, other):
         if other == None: return False
+        if isinstance(other, BitGrid): return other == self
         return self.data == other.data
 
     def __hash__(self):
@@ -280,6 +283,158 @@ def reconstituteGrid(bitRep):
     width, height = bitRep[:2]
     return Grid(width, height, bitRepresentation= bitRep[2:])
 
+class BitGrid:
+    """
+    A boolean Grid packed into a single Python int.  Cell (x,y) lives in bit
+    x * height + y, the same cell order used by Grid._cellIndexToPosition, so
+    a BitGrid hashes like the equivalent Grid.
+
+    BitGrids are treated as immutable values by the game rules: a successor
+    state shares its parent's food and only builds a new BitGrid (one int)
+    when a pellet is eaten.  grid[x][y] reads and writes still work, so code
+    written against Grid keeps working.
+    """
+    def __init__(self, width, height, bits=0):
+        self.width = width
+        self.height = height
+        self.bits = bits
+
+    def fromGrid(grid):
+        bits = 0
+        index = 0
+        for column in grid.data:
+            for cell in column:
+                if cell: bits |= 1 << index
+                index += 1
+        return BitGrid(grid.width, grid.height, bits)
+    fromGrid = staticmethod(fromGrid)
+
+    def __getitem__(self, x):
+        if x < 0 or x >= self.width: raise IndexError('BitGrid column out of range')
+        return _BitGridColumn(self, x)
+
+    def isSet(self, x, y):
+        return (self.bits >> (x * self.height + y)) & 1 == 1
+
+    def setBit(self, x, y, value):
+        mask = 1 << (x * self.height + y)
+        if value:
+            self.bits |= mask
+        else:
+            self.bits &= ~mask
+
+    def without(self, x, y):
+        """
+        Returns a new BitGrid with (x,y) cleared; this grid is left untouched.
+        """
+        return BitGrid(self.width, self.height, self.bits & ~(1 << (x * self.height + y)))
+
+    def __str__(self):
+        return str(self.asGrid())
+
+    def __eq__(self, other):
+        if other == None: return False
+        if isinstance(other, Grid): other = BitGrid.fromGrid(other)
+        return self.bits == other.bits and self.width == other.width and self.height == other.height
+
+    def __hash__(self):
+        return hash(self.bits)
+
+    def copy(self):
+        return BitGrid(self.width, self.height, self.bits)
+
+    def deepCopy(self):
+        return self.copy()
+
+    def shallowCopy(self):
+        return self.copy()
+
+    def count(self, item =True ):
+        trueCount = self.bits.bit_count()
+        if item: return trueCount
+        return self.width * self.height - trueCount
+
+    def asList(self, key = True):
+        if not key: return self.asGrid().asList(key)
+        list = []
+        bits = self.bits
+        height = self.height
+        while bits:
+            lowest = bits & -bits
+            index = lowest.bit_length() - 1
+            list.append( (index // height, index % height) )
+            bits ^= lowest
+        return list
+
+    def asGrid(self):
+        g = Grid(self.width, self.height)
+        for x, y in self.asList():
+            g.data[x][y] = True
+        return g
+
+    def packBits(self):
+        return self.asGrid().packBits()
+
+class _BitGridColumn:
+    "A view of one BitGrid column so that grid[x][y] indexing works."
+    __slots__ = ('grid', 'x')
+
+    def __init__(self, grid, x):
+        self.grid = grid
+        self.x = x
+
+    def __getitem__(self, y):
+        if y < 0 or y >= self.grid.height: raise IndexError('BitGrid row out of range')
+        return self.grid.isSet(self.x, y)
+
+    def __setitem__(self, y, value):
+        self.grid.setBit(self.x, y, value)
+
+    def __len__(self):
+        return self.grid.height
+
+class FrozenGrid(Grid):
+    """
+    An immutable boolean Grid, for the walls and food of a Layout that every
+    state, copy and worker process shares.  Columns are tuples, so
+    grid[x][y] reads cost the same as in a Grid and writes raise TypeError,
+    and bits holds the cells as a bitset in BitGrid order.  copy() returns
+    an ordinary (mutable) Grid.
+    """
+    def __init__(self, grid):
+        self.CELLS_PER_INT = 30
+        self.width = grid.width
+        self.height = grid.height
+        self.data = tuple(tuple(bool(cell) for cell in column) for column in grid.data)
+        self.bits = BitGrid.fromGrid(self).bits
+
+    def __setitem__(self, key, item):
+        raise TypeError('FrozenGrid does not support item assignment')
+
+    def __eq__(self, other):
+        if other == None: return False
+        if not isinstance(other, BitGrid): other = BitGrid.fromGrid(other)
+        return self.bits == other.bits and self.width == other.width and self.height == other.height
+
+    def __hash__(self):
+        return hash(self.bits)
+
+    def copy(self):
+        g = Grid(self.width, self.height)
+        g.data = [list(x) for x in self.data]
+        return g
+
+    def deepCopy(self):
+        return self
+
+    def shallowCopy(self):
+        return self
+
+    def count(self, item =True ):
+        trueCount = self.bits.bit_count()
+        if item: return trueCount
+        return self.width * self.height - trueCount
+
 ####################################
 # Parts you shouldn't have to read #
 ####################################
@@ -368,6 +523,31 @@ class Actions:
         return (x + dx, y + dy)
     getSuccessor = staticmethod(getSuccessor)
 
+_ZOBRIST_KEYS = {}
+
+def zobristKey( feature ):
+    """
+    Returns a fixed 64-bit random key for a hashable state feature.  Keys are
+    derived from repr(feature) rather than hash(), so they agree across
+    processes and runs.
+    """
+    key = _ZOBRIST_KEYS.get( feature )
+    if key is None:
+        digest = hashlib.blake2b( repr( feature ).encode(), digest_size=8 ).digest()
+        key = _ZOBRIST_KEYS[feature] = int.from_bytes( digest, 'big' )
+    return key
+
+def agentZobristKey( index, agentState ):
+    """
+    The Zobrist key of an agent's position, direction and scared timer.
+    Positions are multiples of 0.5 (scared ghosts move at half speed), so
+    they are doubled to keep the feature integral.
+    """
+    configuration = agentState.configuration
+    if configuration == None: return zobristKey( ( 'agent', index, None, agentState.scaredTimer ) )
+    x, y = configuration.pos
+    return zobristKey( ( 'agent', index, int( x * 2 ), int( y * 2 ), configuration.direction, agentState.scaredTimer ) )
+
 class GameStateData:
     """
 
@@ -377,12 +557,17 @@ class GameStateData:
         Generates a new data packet by copying information from its predecessor.
         """
         if prevState != None:
-            self.food = prevState.food.shallowCopy()
-            self.capsules = prevState.capsules[:]
-            self.agentStates = self.copyAgentStates( prevState.agentStates )
+            # Food (a BitGrid), capsules (a tuple) and the AgentStates are
+            # shared with the predecessor; the rules replace them on write.
+            self.food = prevState.food
+            self.capsules = prevState.capsules
+            self.agentStates = prevState.agentStates[:]
             self.layout = prevState.layout
             self._eaten = prevState._eaten
             self.score = prevState.score
+            self._zobrist = prevState._zobrist
+        else:
+            self._zobrist = None
 
         self._foodEaten = None
         self._foodAdded = None
@@ -393,9 +578,22 @@ class GameStateData:
         self.scoreChange = 0
 
     def deepCopy( self ):
+        """
+        The layout never changes (Layout.deepCopy returns the layout itself),
+        so a deep copy is a snapshot.
+        """
+        return self.snapshot()
+
+    def snapshot( self ):
+        """
+        A copy that shares the layout, which the game never changes.  The
+        food is a new BitGrid over the same int and the agents are copied, so
+        writes to the copy stay private and copying costs the same on any
+        board size.
+        """
         state = GameStateData( self )
         state.food = self.food.deepCopy()
-        state.layout = self.layout.deepCopy()
+        state.agentStates = self.copyAgentStates( self.agentStates )
         state._agentMoved = self._agentMoved
         state._foodEaten = self._foodEaten
         state._foodAdded = self._foodAdded
@@ -408,6 +606,15 @@ class GameStateData:
             copiedStates.append( agentState.copy() )
         return copiedStates
 
+    def copyAgentState( self, index ):
+        """
+        Replaces the (possibly shared) AgentState at index with a private copy
+        and returns it.  Call this before mutating an agent in a successor.
+        """
+        agentState = self.agentStates[index].copy()
+        self.agentStates[index] = agentState
+        return agentState
+
     def __eq__( self, other ):
         """
         Allows two states to be compared.
@@ -423,14 +630,37 @@ class GameStateData:
     def __hash__( self ):
         """
         Allows states to be keys of dictionaries.
+
+        The agents, food and capsules are covered by a Zobrist hash that the
+        game rules keep up to date as successors are generated, so this is
+        O(1) rather than a walk over the whole board.
+        """
+        if self._zobrist is None:
+            self._zobrist = self.computeZobrist()
+        return self._zobrist ^ ( hash( self.score ) * 0x9E3779B97F4A7C15 & 0xFFFFFFFFFFFFFFFF )
+
+    def computeZobrist( self ):
         """
-        for i, state in enumerate( self.agentStates ):
-            try:
-                int(hash(state))
-            except TypeError as e:
-                print(e)
-                #hash(state)
-        return int((hash(tuple(self.agentStates)) + 13*hash(self.food) + 113* hash(tuple(self.capsules)) + 7 * hash(self.score)) % 1048575 )
+        Computes the Zobrist hash of the agents, food and capsules from scratch.
+        """
+        h = 0
+        for index, agentState in enumerate( self.agentStates ):
+            h ^= agentZobristKey( index, agentState )
+        for x, y in self.food.asList():
+            h ^= zobristKey( ( 'food', x, y ) )
+        for x, y in self.capsules:
+            h ^= zobristKey( ( 'capsule', x, y ) )
+        return h
+
+    def toggleHash( self, feature ):
+        "XORs a ('food', x, y) or ('capsule', x, y) feature into or out of the hash."
+        if self._zobrist is not None:
+            self._zobrist ^= zobristKey( feature )
+
+    def toggleAgentHash( self, index ):
+        "XORs the current state of agent index into or out of the hash."
+        if self._zobrist is not None:
+            self._zobrist ^= agentZobristKey( index, self.agentStates[index] )
 
     def __str__( self ):
         width, height = self.layout.width, self.layout.height
@@ -488,9 +718,9 @@ class GameStateData:
         """
         Creates an initial game state from a layout array (see layout.py).
         """
-        self.food = layout.food.copy()
+        self.food = BitGrid.fromGrid(layout.food)
         #self.capsules = []
-        self.capsules = layout.capsules[:]
+        self.capsules = tuple(layout.capsules)
         self.layout = layout
         self.score = 0
         self.scoreChange = 0
@@ -503,6 +733,7 @@ class GameStateData:
                 else: numGhosts += 1
             self.agentStates.append( AgentState( Configuration( pos, Directions.STOP), isPacman) )
         self._eaten = [False for a in self.agentStates]
+        self._zobrist = self.computeZobrist()
 
 try:
     import boinc
@@ -515,7 +746,10 @@ class Game:
     The Game manages the control flow, soliciting actions from agents.
     """
 
-    def __init__( self, agents, display, rules, startingIndex=0, muteAgents=False, catchExceptions=False ):
+    def __init__( self, agents, display, rules, startingIndex=0, muteAgents=False, catchExceptions=False,
+                  telemetry=None ):
+        # A telemetry.TelemetrySink, or None
+        self.telemetry = telemetry
         self.agentCrashed = False
         self.agents = agents
         self.display = display
@@ -528,6 +762,8 @@ class Game:
         self.totalAgentTimes = [0 for agent in agents]
         self.totalAgentTimeWarnings = [0 for agent in agents]
         self.agentTimeout = False
+        # The SearchCounters of each search agent over the game, set by run
+        self.searchCounters = [None for agent in agents]
         import io
         self.agentOutput = [io.StringIO() for agent in agents]
 
@@ -568,6 +804,19 @@ class Game:
         """
         Main control loop for game play.
         """
+        if self.telemetry is not None:
+            self.telemetryGameId = self.telemetry.startGame()
+        startTime = time.perf_counter()
+        try:
+            self._run()
+        finally:
+            # Only the counts are kept, not the agents or their states
+            self.searchCounters = [agent.getGameCounters() if 'getGameCounters' in dir( agent ) else None
+                                   for agent in self.agents]
+            if self.telemetry is not None:
+                self.telemetry.recordGame( self.telemetryGameId, self, time.perf_counter() - startTime )
+
+    def _run( self ):
         self.display.initialize(self.state.data)
         self.numMoves = 0
 
@@ -587,7 +836,7 @@ class Game:
                 self.mute(i)
                 if self.catchExceptions:
                     try:
-                        timed_func = TimeoutFunction(agent.registerInitialState, int(self.rules.getMaxStartupTime(i)))
+                        timed_func = TimeoutFunction(agent.registerInitialState, self.rules.getMaxStartupTime(i))
                         try:
                             start_time = time.time()
                             timed_func(self.state.deepCopy())
@@ -616,12 +865,14 @@ class Game:
             agent = self.agents[agentIndex]
             move_time = 0
             skip_action = False
+            if self.telemetry is not None:
+                decisionStart = time.perf_counter()
             # Generate an observation of the state
             if 'observationFunction' in dir( agent ):
                 self.mute(agentIndex)
                 if self.catchExceptions:
                     try:
-                        timed_func = TimeoutFunction(agent.observationFunction, int(self.rules.getMoveTimeout(agentIndex)))
+                        timed_func = TimeoutFunction(agent.observationFunction, self.rules.getMoveTimeout(agentIndex))
                         try:
                             start_time = time.time()
                             observation = timed_func(self.state.deepCopy())
@@ -644,7 +895,7 @@ class Game:
             self.mute(agentIndex)
             if self.catchExceptions:
                 try:
-                    timed_func = TimeoutFunction(agent.getAction, int(self.rules.getMoveTimeout(agentIndex)) - int(move_time))
+                    timed_func = TimeoutFunction(agent.getAction, self.rules.getMoveTimeout(agentIndex) - move_time)
                     try:
                         start_time = time.time()
                         if skip_action:
@@ -686,6 +937,11 @@ class Game:
                 action = agent.getAction(observation)
             self.unmute()
 
+            if self.telemetry is not None:
+                latency = time.perf_counter() - decisionStart
+                nodes = agent.getMoveCounters().getNodes() if 'getMoveCounters' in dir( agent ) else None
+                scoreBefore = self.state.data.score
+
             # Execute the action
             self.moveHistory.append( (agentIndex, action) )
             if self.catchExceptions:
@@ -699,6 +955,10 @@ class Game:
             else:
                 self.state = self.state.generateSuccessor( agentIndex, action )
 
+            if self.telemetry is not None:
+                self.telemetry.recordMove( self.telemetryGameId, len( self.moveHistory ) - 1, agentIndex, action, latency,
+                                           nodes, self.state, self.state.data.score - scoreBefore )
+
             # Change the display
             self.display.update( self.state.data )
             ###idx = agentIndex - agentIndex % 2 + 1
@@ -83,11 +83,14 @@ to follow your instructor's guidelines to receive credit on your project.
     def addExceptionMessage(self, q, inst, traceback):
         self.fail(f'FAIL: Exception raised: {inst}')
         self.addMessage('')
-        for line in traceback.format_exc().split('\n'):
+        # An exception from a test run in a worker (autograder.py --jobs)
+        # brings the traceback of the student's code along
+        tracebackText = getattr(inst, 'tracebackText', None) or traceback.format_exc()
+        for line in tracebackText.split('\n'):
             self.addMessage(line)
 
     def addErrorHints(self, exceptionMap, errorInstance, questionNum):
-        typeOf = str(type(errorInstance))
+        typeOf = getattr(errorInstance, 'typeName', None) or str(type(errorInstance))
         questionName = 'q' + questionNum
         errorHint = ''
 
@@ -13,15 +13,32 @@
 
 
 from util import manhattanDistance
-from game import Grid
+from game import Grid, FrozenGrid
+from array import array
+from collections import deque
+import hashlib
+import mmap
 import os
 import random
+import struct
+import sys
+import tempfile
 
 VISIBILITY_MATRIX_CACHE = {}
+DISTANCE_TABLE_CACHE = {}
+NEIGHBOR_TABLE_CACHE = {}
+ACTION_TABLES_CACHE = {}
+LAYOUT_CACHE = {}
 
 class Layout:
     """
     A Layout manages the static information about the game board.
+
+    Layouts never change once built: the walls and food are FrozenGrids and
+    the capsules and agent positions tuples, so deepCopy (and copy.copy and
+    copy.deepcopy) return the layout itself.  internLayout keeps one Layout
+    per layout text in each process, and a pickled Layout is rebuilt through
+    it, so states shipped to another process share that process's layout.
     """
 
     def __init__(self, layoutText):
@@ -33,8 +50,13 @@ class Layout:
         self.agentPositions = []
         self.numGhosts = 0
         self.processLayoutText(layoutText)
-        self.layoutText = layoutText
-        self.totalFood = len(self.food.asList())
+        self.walls = FrozenGrid(self.walls)
+        self.food = FrozenGrid(self.food)
+        self.capsules = tuple(self.capsules)
+        self.agentPositions = tuple(self.agentPositions)
+        self.layoutText = tuple(layoutText)
+        self.totalFood = self.food.count()
+        self.actionTables = None
         # self.initializeVisibilityMatrix()
 
     def getNumGhosts(self):
@@ -61,6 +83,88 @@ class Layout:
         else:
             self.visibility = VISIBILITY_MATRIX_CACHE[reduce(str.__add__, self.layoutText)]
 
+    def getDistanceTable(self):
+        """
+        Returns the DistanceTable for this maze, building it on first use.
+        Tables are cached per layout text, so copies of a layout share one,
+        and on disk (see DistanceTable.CACHE_DIR), so later processes map the
+        stored table instead of recomputing it.  A stored table is only used
+        if it records the hash of this layout's text.
+        """
+        key = "\n".join(self.layoutText)
+        table = DISTANCE_TABLE_CACHE.get(key)
+        if table is None:
+            digest = hashlib.sha1(key.encode())
+            path = os.path.join(DistanceTable.CACHE_DIR, digest.hexdigest() + '.dist')
+            table = DistanceTable.load(path, self.width, self.height, digest.digest())
+            if table is None:
+                table = DistanceTable(self.walls)
+                table.save(path, digest.digest())
+            DISTANCE_TABLE_CACHE[key] = table
+        return table
+
+    def getMazeDistance(self, pos1, pos2):
+        return self.getDistanceTable().getDistance(pos1, pos2)
+
+    # The order of the directions in getNeighborTable (as in Actions._directions)
+    NEIGHBOR_DIRECTIONS = ('North', 'South', 'East', 'West')
+
+    def getNeighborTable(self):
+        """
+        Returns an array with, for the cell x * height + y and the k-th of
+        NEIGHBOR_DIRECTIONS, the index of the open cell one step that way at
+        4 * cell + k, or -1 if the step is blocked (or the cell is a wall).
+        Cells are indexed like the bits of a BitGrid.  Cached per layout text.
+        """
+        key = "\n".join(self.layoutText)
+        table = NEIGHBOR_TABLE_CACHE.get(key)
+        if table is None:
+            table = array('i', [-1]) * (4 * self.width * self.height)
+            for x in range(self.width):
+                for y in range(self.height):
+                    if self.walls[x][y]: continue
+                    cell = x * self.height + y
+                    for k, (nx, ny) in enumerate(((x, y + 1), (x, y - 1), (x + 1, y), (x - 1, y))):
+                        if 0 <= nx < self.width and 0 <= ny < self.height and not self.walls[nx][ny]:
+                            table[4 * cell + k] = nx * self.height + ny
+            NEIGHBOR_TABLE_CACHE[key] = table
+        return table
+
+    def getActionTables(self):
+        """
+        Returns (pacmanActions, ghostActions): for every open grid point
+        (x, y), the tuple of Actions.getPossibleActions there at
+        pacmanActions[(x, y)], and GhostRules' legal actions (no STOP, no
+        turning back unless at a dead end) at ghostActions[(x, y)][direction]
+        for each direction the ghost arrived in.  Positions in between grid
+        points are not in the tables.  Cached per layout text.
+        """
+        if self.actionTables is None:
+            key = "\n".join(self.layoutText)
+            tables = ACTION_TABLES_CACHE.get(key)
+            if tables is None:
+                tables = ACTION_TABLES_CACHE[key] = self.buildActionTables()
+            self.actionTables = tables
+        return self.actionTables
+
+    def buildActionTables(self):
+        from game import Actions, Configuration, Directions
+        pacmanActions, ghostActions = {}, {}
+        for x in range(self.width):
+            for y in range(self.height):
+                if self.walls[x][y]: continue
+                possible = Actions.getPossibleActions(Configuration((x, y), Directions.STOP), self.walls)
+                pacmanActions[(x, y)] = tuple(possible)
+                moves = [a for a in possible if a != Directions.STOP]
+                ghostActions[(x, y)] = byDirection = {}
+                for direction in Actions._directions:
+                    reverse = Actions.reverseDirection(direction)
+                    if reverse in moves and len(moves) > 1:
+                        byDirection[direction] = tuple(a for a in moves if a != reverse)
+                    else:
+                        byDirection[direction] = tuple(moves)
+        return pacmanActions, ghostActions
+
     def isWall(self, pos):
         x, col = pos
         return self.walls[x][col]
@@ -90,7 +194,16 @@ class Layout:
         return "\n".join(self.layoutText)
 
     def deepCopy(self):
-        return Layout(self.layoutText[:])
+        return self
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return (internLayout, (self.layoutText,))
 
     def processLayoutText(self, layoutText):
         """
@@ -128,6 +241,156 @@ class Layout:
         elif layoutChar in  ['1', '2', '3', '4']:
             self.agentPositions.append( (int(layoutChar), (x,y)))
             self.numGhosts += 1
+class DistanceTable:
+    """
+    All-pairs shortest path lengths between the non-wall cells of a maze.
+
+    The open cells are numbered 0..numCells-1 in x-major order.  cellIds maps
+    x * height + y to that number (or -1 for a wall), neighbors holds the up
+    to four neighbouring cell numbers of every cell (padded with -1), and
+    distances holds one unsigned 16-bit entry per ordered pair of cells, so
+    a lookup is two array reads.  Each row is filled by a BFS from its cell.
+
+    Tables can be saved to a binary file and loaded back as memory-mapped
+    views (see save and load), in which case the arrays are memoryviews
+    over the file rather than arrays.
+    """
+    UNREACHABLE = 0xFFFF
+    # A per-user directory, overridable with the PACMAN_CACHE_DIR environment variable
+    CACHE_DIR = os.environ.get('PACMAN_CACHE_DIR', os.path.join(
+        os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache')), 'pacman-layouts'))
+    # magic, byte order, SHA-1 of the layout text, width, height, numCells
+    HEADER = struct.Struct('=4s4s20sIII')
+    # Changes with the file format
+    MAGIC = b'PDT2'
+
+    def __init__(self, walls=None):
+        if walls is None: return # Filled in by load
+        self.width = walls.width
+        self.height = walls.height
+        self.cellIds = array('i', [-1]) * (self.width * self.height)
+        self.cells = []
+        for x in range(self.width):
+            for y in range(self.height):
+                if not walls[x][y]:
+                    self.cellIds[x * self.height + y] = len(self.cells)
+                    self.cells.append((x, y))
+        self.numCells = len(self.cells)
+        self.neighbors = array('i', [-1]) * (4 * self.numCells)
+        for cell, (x, y) in enumerate(self.cells):
+            slot = 4 * cell
+            for nx, ny in ((x, y + 1), (x, y - 1), (x + 1, y), (x - 1, y)):
+                if 0 <= nx < self.width and 0 <= ny < self.height:
+                    neighbor = self.cellIds[nx * self.height + ny]
+                    if neighbor >= 0:
+                        self.neighbors[slot] = neighbor
+                        slot += 1
+        self.distances = array('H', [self.UNREACHABLE]) * (self.numCells * self.numCells)
+        for source in range(self.numCells):
+            self._bfs(source)
+
+    def _bfs(self, source):
+        distances, neighbors = self.distances, self.neighbors
+        row = source * self.numCells
+        distances[row + source] = 0
+        queue = deque([source])
+        while queue:
+            cell = queue.popleft()
+            nextDistance = distances[row + cell] + 1
+            for slot in range(4 * cell, 4 * cell + 4):
+                neighbor = neighbors[slot]
+                if neighbor < 0: break
+                if distances[row + neighbor] == self.UNREACHABLE:
+                    distances[row + neighbor] = nextDistance
+                    queue.append(neighbor)
+
+    def save(self, path, digest):
+        """
+        Writes the table to path: a fixed header, which records digest (the
+        SHA-1 of the layout text), followed by the raw cellIds, neighbors and
+        distances arrays.  The file is written under a temporary name and
+        renamed, so concurrent readers never see half a table, and the
+        temporary file is removed if writing fails.  Failing to write (e.g. a
+        read-only cache) is not an error.
+        """
+        byteOrder = sys.byteorder[:4].encode().ljust(4)
+        tmpPath = None
+        try:
+            os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+            handle, tmpPath = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(handle, 'wb') as f:
+                f.write(self.HEADER.pack(self.MAGIC, byteOrder, digest, self.width, self.height, self.numCells))
+                for data in (self.cellIds, self.neighbors, self.distances):
+                    f.write(bytes(data))
+            os.replace(tmpPath, path)
+            tmpPath = None
+        except OSError:
+            pass
+        finally:
+            if tmpPath is not None:
+                try:
+                    os.remove(tmpPath)
+                except OSError:
+                    pass
+
+    def load(path, width, height, digest):
+        """
+        Maps a table written by save.  Returns None if the file is missing,
+        was written in another format or on a machine with a different byte
+        order, or is not the table of the width x height layout whose text
+        has the SHA-1 digest.
+        """
+        try:
+            with open(path, 'rb') as f:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        header = DistanceTable.HEADER
+        if len(buffer) < header.size:
+            return None
+        magic, byteOrder, fileDigest, fileWidth, fileHeight, numCells = header.unpack_from(buffer)
+        if magic != DistanceTable.MAGIC or byteOrder.strip() != sys.byteorder[:4].encode() \
+                or fileDigest != digest or (fileWidth, fileHeight) != (width, height):
+            return None
+        sizes = (4 * width * height, 4 * 4 * numCells, 2 * numCells * numCells)
+        if len(buffer) != header.size + sum(sizes):
+            return None
+        table = DistanceTable()
+        table.width, table.height, table.numCells = width, height, numCells
+        table._buffer = buffer # Keeps the mapping alive
+        view = memoryview(buffer)
+        offset = header.size
+        arrays = []
+        for size, code in zip(sizes, ('i', 'i', 'H')):
+            arrays.append(view[offset:offset + size].cast(code))
+            offset += size
+        table.cellIds, table.neighbors, table.distances = arrays
+        table.cells = [None] * numCells
+        for index in range(width * height):
+            cell = table.cellIds[index]
+            if cell >= 0: table.cells[cell] = (index // height, index % height)
+        return table
+    load = staticmethod(load)
+
+    def getCellId(self, pos):
+        """
+        Returns the cell number of a position, or -1 for a wall.  Positions
+        between grid points (scared ghosts) are rounded to the nearest cell.
+        """
+        x, y = pos
+        return self.cellIds[int(x + 0.5) * self.height + int(y + 0.5)]
+
+    def getDistance(self, pos1, pos2):
+        """
+        Returns the maze distance between two positions, or float('inf') if
+        either is a wall or there is no path between them.
+        """
+        cell1, cell2 = self.getCellId(pos1), self.getCellId(pos2)
+        if cell1 < 0 or cell2 < 0: return float('inf')
+        distance = self.distances[cell1 * self.numCells + cell2]
+        if distance == self.UNREACHABLE: return float('inf')
+        return distance
+
 def getLayout(name, back = 2):
     if name.endswith('.lay'):
         layout = tryToLoad('layouts/' + name)
@@ -142,8 +405,16 @@ def getLayout(name, back = 2):
         os.chdir(curdir)
     return layout
 
+def internLayout(layoutText):
+    "Returns the Layout of layoutText (a sequence of lines), shared within the process."
+    key = "\n".join(layoutText)
+    layout = LAYOUT_CACHE.get(key)
+    if layout is None:
+        layout = LAYOUT_CACHE[key] = Layout(list(layoutText))
+    return layout
+
 def tryToLoad(fullname):
     if(not os.path.exists(fullname)): return None
     f = open(fullname)
-    try: return Layout([line.strip() for line in f])
+    try: return internLayout([line.strip() for line in f])
     finally: f.close()
@@ -14,10 +14,14 @@
 from math import dist
 from util import manhattanDistance
 from game import Directions
-import random, util
+import random, util, time, math
+import ghostAgents
+import vectorEvaluation
+import parallelSearch
+import simulator
 
 from game import Agent
-from pacman import GameState
+from pacman import GameState, TIME_PENALTY
 
 class ReflexAgent(Agent):
     """
@@ -41,7 +45,7 @@ class ReflexAgent(Agent):
         legalMoves = gameState.getLegalActions()
 
         # Choose one of the best actions
-        scores = [self.evaluationFunction(gameState, action) for action in legalMoves]
+        scores = self.evaluateActions(gameState, legalMoves)
         bestScore = max(scores)
         bestIndices = [index for index in range(len(scores)) if scores[index] == bestScore]
         chosenIndex = random.choice(bestIndices) # Pick randomly among the best
@@ -50,6 +54,17 @@ class ReflexAgent(Agent):
 
         return legalMoves[chosenIndex]
 
+    def evaluateActions(self, gameState, actions):
+        """
+        Scores every action of gameState at once.  The evaluationFunction
+        below is vectorized with NumPy when it is installed; one that a
+        subclass overrides is called once per action.
+        """
+        if vectorEvaluation.NUMPY_AVAILABLE and type(self).evaluationFunction is ReflexAgent.evaluationFunction:
+            successors = [gameState.generatePacmanSuccessor(action) for action in actions]
+            return vectorEvaluation.reflexEvaluationBatch(gameState, successors).tolist()
+        return [self.evaluationFunction(gameState, action) for action in actions]
+
 # DANIELA 
     def evaluationFunction(self, currentGameState, action):
         """
@@ -114,10 +129,406 @@ class MultiAgentSearchAgent(Agent):
       is another abstract class.
     """
 
-    def __init__(self, evalFn = 'scoreEvaluationFunction', depth = '2'):
+    # With moveTime=auto, the share of the rules' per-move timeout to spend
+    AUTO_MOVE_FRACTION = 0.05
+
+    def __init__(self, evalFn = 'scoreEvaluationFunction', depth = '2', ttSize = '0', moveTime = '0', batchDepth = '0', workers = '0',
+                 seed = ''):
         self.index = 0 # Pacman is always agent index 0
         self.evaluationFunction = util.lookup(evalFn, globals())
         self.depth = int(depth)
+        # A transposition table is opt-in (e.g. -a ttSize=200000): it skips
+        # re-expanding states, which the autograder's node counts do not expect
+        self.transpositionTable = TranspositionTable(int(ttSize)) if int(ttSize) > 0 else None
+        # moveTime=<seconds> or moveTime=auto switches the agents that support
+        # it to iterative deepening; depth is then ignored
+        self.moveTime = moveTime
+        self.moveTimeout = None
+        self.deadline = None
+        self.depthCutoff = False
+        self.completedDepth = 0
+        # batchDepth=<n> makes the agents that support it expand the last n
+        # levels of depth in one go and score all of their leaves together
+        # with evaluateStates instead of one evaluationFunction call each
+        self.batchDepth = int(batchDepth)
+        # workers=<n> searches the root moves of the agents that support it
+        # in a pool of n processes (see parallelSearch.py)
+        self.workers = int(workers)
+        self.searchPool = None
+        # The agents that sample draw from a generator of their own (see
+        # seedRandom), seeded with seed=<n> if given
+        self.seed = seed
+        self.random = random.Random(seed) if seed != '' else random.Random()
+        # Node, evaluation, cut-off and transposition-hit counts of the move
+        # being searched and of the moves before it (see SearchCounters)
+        self.gameCounters = SearchCounters()
+        self.resetMoveCounters()
+
+    def __getstate__(self):
+        "The worker pool stays behind when the agent is pickled."
+        state = self.__dict__.copy()
+        state['searchPool'] = None
+        return state
+
+    def evaluateStates(self, gameStates):
+        """
+        Returns the evaluationFunction of every state in gameStates, which
+        must share a layout (e.g. sibling leaves of the search tree).
+        """
+        self.counters.evaluations += len(gameStates)
+        return evaluateStates(self.evaluationFunction, gameStates)
+
+    def evaluate(self, gameState):
+        "The evaluationFunction of a leaf of the search, counted."
+        self.counters.evaluations += 1
+        return self.evaluationFunction(gameState)
+
+    def collectFrontier(self, gameState, agentIndex, plies, numAgents, leaves, actions=None, ply=0):
+        """
+          Expands the next plies moves below gameState, with agents taking
+          turns modulo numAgents, and appends the states at the end of them
+          (or where the game ends) to leaves.  Returns the subtree as nested
+          (agentIndex, actions, children) tuples whose leaves are indices
+          into leaves.  actions overrides the moves tried at gameState, and
+          ply is gameState's ply in the whole search, for the counters.
+        """
+        if gameState.isWin() or gameState.isLose():
+            leaves.append(gameState)
+            return len(leaves) - 1
+        if plies == 0:
+            self.depthCutoff = True
+            leaves.append(gameState)
+            return len(leaves) - 1
+        nextAgent = (agentIndex + 1) % numAgents
+        if actions is None:
+            actions = gameState.getLegalActions(agentIndex)
+        self.counters.countNodes(ply + 1, len(actions))
+        children = [self.collectFrontier(gameState.generateSuccessor(agentIndex, action), nextAgent,
+                                         plies - 1, numAgents, leaves, ply=ply + 1) for action in actions]
+        return agentIndex, actions, children
+
+    def backUpFrontier(self, tree, values, combine):
+        """
+          Returns (action, value) of a subtree built by collectFrontier, given
+          the values of its leaves.  combine(agentIndex, actions, childValues)
+          returns (action, value) for an inner node.
+        """
+        if isinstance(tree, int):
+            return None, values[tree]
+        agentIndex, actions, children = tree
+        childValues = [self.backUpFrontier(child, values, combine)[1] for child in children]
+        return combine(agentIndex, actions, childValues)
+
+    def searchFrontier(self, gameState, agentIndex, plies, numAgents, combine, actions=None, ply=0):
+        "Expands plies moves below gameState, scores the leaves in one batch and backs them up."
+        self.checkDeadline()
+        leaves = []
+        tree = self.collectFrontier(gameState, agentIndex, plies, numAgents, leaves, actions, ply)
+        return self.backUpFrontier(tree, self.evaluateStates(leaves), combine)
+
+    def registerInitialState(self, gameState):
+        if self.transpositionTable is not None:
+            self.transpositionTable.clear()
+        self.gameCounters = SearchCounters()
+        self.resetMoveCounters()
+        if self.samplesMoves():
+            self.seedRandom()
+        self.closeSearchPool()
+        if self.workers > 1 and parallelSearch.canStartPool():
+            self.searchPool = parallelSearch.SearchPool(self, gameState.data.layout, self.workers)
+
+    def final(self, gameState):
+        self.closeSearchPool()
+
+    def samplesMoves(self):
+        "Whether the search draws from self.random."
+        return False
+
+    def seedRandom(self):
+        """
+          Seeds self.random for a new game, with seed=<n> or else with one
+          draw from the random module.  Searching then leaves the random
+          module alone, so how much an agent searches does not change the
+          moves of the ghosts of a seeded game.
+        """
+        self.random.seed(self.seed if self.seed != '' else random.getrandbits(64))
+
+    def closeSearchPool(self):
+        if self.searchPool is not None:
+            self.searchPool.close()
+            self.searchPool = None
+
+    def resetMoveCounters(self):
+        self.counters = SearchCounters()
+        # The nodes per ply of the last completed iterative deepening
+        # iteration, for the move's branching factor
+        self.iterationNodesPerPly = None
+        table = self.transpositionTable
+        self.ttHitsAtStart = table.hits if table is not None else 0
+
+    def startMove(self):
+        "Called by getAction: the counters of the last move go into the game's."
+        self.gameCounters.add(self.getMoveCounters())
+        self.resetMoveCounters()
+        self.counters.moves = 1
+
+    def getMoveCounters(self):
+        "The SearchCounters of the move being searched (or the last one)."
+        if self.transpositionTable is not None:
+            self.counters.ttHits = self.transpositionTable.hits - self.ttHitsAtStart
+        nodesPerPly = self.iterationNodesPerPly
+        self.counters.setBranchingFactor(nodesPerPly if nodesPerPly is not None else self.counters.nodesPerPly)
+        return self.counters
+
+    def getGameCounters(self):
+        "The SearchCounters of every move of the game so far."
+        counters = SearchCounters()
+        counters.add(self.gameCounters)
+        counters.add(self.getMoveCounters())
+        return counters
+
+    def combineMax(agentIndex, actions, values):
+        "The first action with the highest value, as the serial search picks it."
+        bestAct, bestVal = None, float("-inf")
+        for action, val in zip(actions, values):
+            if val > bestVal:
+                bestVal, bestAct = val, action
+        return bestAct, bestVal
+    combineMax = staticmethod(combineMax)
+
+    def searchRootParallel(self, gameState, actions):
+        """
+          Searches the subtree of every root action in the worker pool, with
+          the agent's searchRootAction(gameState, action), and returns
+          (action, value) of the first best one.
+        """
+        self.searchPool.resetAlpha()
+        self.counters.countNodes(0)
+        results = self.searchPool.map('searchRootAction', gameState, [(action,) for action in actions],
+                                      self.depth, self.deadline)
+        values = []
+        for value, depthCutoff, timedOut, counters in results:
+            self.counters.add(counters)
+            if timedOut:
+                raise SearchTimeout()
+            self.depthCutoff = self.depthCutoff or depthCutoff
+            values.append(value)
+        return self.combineMax(0, actions, values)
+
+    def setMoveTimeout(self, timeout):
+        "Called by ClassicGameRules.newGame with the rules' per-move timeout."
+        self.moveTimeout = timeout
+
+    def isIterative(self):
+        return self.moveTime == 'auto' or float(self.moveTime) > 0
+
+    def getMoveBudget(self):
+        """
+          Seconds to spend on one move.  An explicit moveTime is capped by the
+          rules' move timeout (or the time left of the running timeout) so
+          that a move never times out in Game.run.
+        """
+        moveTimeout = self.moveTimeout if self.moveTimeout is not None else 30
+        # Under a running timeout (Game.run with catchExceptions) what is
+        # left of it may be less than the rules' move timeout
+        moveTimeout = min(moveTimeout, util.getTimeLeft())
+        if self.moveTime == 'auto':
+            return moveTimeout * self.AUTO_MOVE_FRACTION
+        return min(float(self.moveTime), moveTimeout * 0.9)
+
+    def checkDeadline(self):
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            raise SearchTimeout()
+        if parallelSearch.isCancelled():
+            raise parallelSearch.SearchCancelled()
+
+    def iterativeDeepening(self, gameState, search):
+        """
+          Calls search(gameState, rootActions) with self.depth set to 1, 2, 3,
+          ... until the move budget runs out, and returns the action of the
+          deepest iteration that completed.  Each iteration searches the
+          previous best action first, and a transposition table, if enabled,
+          carries the rest of the earlier iterations over.
+
+          search must return (action, value), call checkDeadline() as it goes
+          and set self.depthCutoff when it stops at the depth limit or uses a
+          transposition table entry whose search did; an iteration that
+          never does has searched the whole game tree.
+        """
+        maxDepth = self.depth
+        self.deadline = time.perf_counter() + self.getMoveBudget()
+        actions = gameState.getLegalActions(0)
+        bestAction = actions[0]
+        self.completedDepth = 0
+        try:
+            depth = 1
+            while True:
+                self.depth = depth
+                self.depthCutoff = False
+                nodesBefore = list(self.counters.nodesPerPly)
+                bestAction, _ = search(gameState, actions)
+                self.completedDepth = depth
+                nodesBefore += [0] * (len(self.counters.nodesPerPly) - len(nodesBefore))
+                self.iterationNodesPerPly = [after - before for after, before in zip(self.counters.nodesPerPly, nodesBefore)]
+                if not self.depthCutoff:
+                    break
+                actions = [bestAction] + [a for a in actions if a != bestAction]
+                depth += 1
+        except SearchTimeout:
+            pass
+        finally:
+            self.depth = maxDepth
+            self.deadline = None
+        return bestAction
+
+class SearchTimeout(Exception):
+    "Raised inside a search when the move's time budget has run out."
+    pass
+
+class TranspositionTable:
+    """
+      A fixed-size table of search results shared across the plies of a game
+      and across turns.  Entries are keyed by (state hash, remaining depth,
+      agent index) and hold a value together with a flag saying whether the
+      value is EXACT, a LOWER bound (the node failed high) or an UPPER bound
+      (it failed low), plus the best action found and whether the search
+      below the node stopped at the depth limit anywhere.  A search that
+      uses such an entry has reached the depth limit too, which iterative
+      deepening needs to know.
+
+      Each key maps to a single slot.  A colliding entry is replaced when it
+      belongs to an earlier search or when the new entry was searched at
+      least as deep (replacement by depth).
+    """
+    EXACT, LOWER, UPPER = 0, 1, 2
+
+    def __init__(self, size):
+        self.size = size
+        self.clear()
+
+    def clear(self):
+        self.slots = [None] * self.size
+        self.generation = 0
+        self.hits = 0
+
+    def newSearch(self):
+        "Marks the entries written so far as belonging to an earlier search."
+        self.generation += 1
+
+    def lookup(self, gameState, depth, agentIndex):
+        """
+          Returns (flag, value, action, depthCutoff) for the state, or None
+          on a miss.
+        """
+        key = (hash(gameState), depth, agentIndex)
+        entry = self.slots[hash(key) % self.size]
+        if entry is None or entry[0] != key:
+            return None
+        self.hits += 1
+        return entry[2], entry[3], entry[4], entry[6]
+
+    def store(self, gameState, depth, agentIndex, flag, value, action=None, depthCutoff=True):
+        key = (hash(gameState), depth, agentIndex)
+        slot = hash(key) % self.size
+        entry = self.slots[slot]
+        if entry is None or entry[0] == key or entry[5] != self.generation or depth >= entry[1]:
+            self.slots[slot] = (key, depth, flag, value, action, self.generation, depthCutoff)
+
+class SearchCounters:
+    """
+      What a search did, for one move or summed over several: the nodes
+      generated at each ply below the root (the root is ply 0 and every
+      agent's move is a ply, except in MinimaxAgent, where only Pacman's
+      are, and in sparse sampling, where all the ghosts of a round make one
+      ply), the leaves evaluated, the nodes cut off (and how many of those
+      by the first move tried), the transposition table hits and the
+      effective branching factor of each move.  Only numbers are kept,
+      never states.
+    """
+    def __init__(self):
+        self.moves = 0
+        self.nodesPerPly = []
+        self.evaluations = 0
+        self.cutoffs = 0
+        self.firstMoveCutoffs = 0
+        self.ttHits = 0
+        # The sum of the moves' effective branching factors (see
+        # setBranchingFactor) and the number of moves summed
+        self.branchingFactors = 0.0
+        self.branchingMoves = 0
+
+    def countNodes(self, ply, count=1):
+        nodes = self.nodesPerPly
+        if ply >= len(nodes):
+            nodes.extend([0] * (ply + 1 - len(nodes)))
+        nodes[ply] += count
+
+    def getNodes(self):
+        return sum(self.nodesPerPly)
+
+    def branchingFactor(nodesPerPly):
+        """
+          The branching factor b of the uniform tree as deep as the deepest
+          ply of a search with as many nodes: 1 + b + b^2 + ... + b^d = nodes.
+        """
+        d = len(nodesPerPly) - 1
+        if d < 1: return 0.0
+        nodes = float(sum(nodesPerPly))
+        lo, hi = 0.0, nodes ** (1.0 / d) + 1.0
+        for i in range(50):
+            b = (lo + hi) / 2
+            if sum([b ** k for k in range(d + 1)]) < nodes:
+                lo = b
+            else:
+                hi = b
+        return (lo + hi) / 2
+    branchingFactor = staticmethod(branchingFactor)
+
+    def setBranchingFactor(self, nodesPerPly):
+        """
+          Sets the effective branching factor of a one-move count from the
+          nodes per ply of the search that chose the move.  Under iterative
+          deepening that is the last iteration that completed, so that
+          iterations of different depths are not mixed.
+        """
+        factor = SearchCounters.branchingFactor(nodesPerPly)
+        self.branchingFactors = factor
+        self.branchingMoves = 1 if factor > 0 else 0
+
+    def getCutoffRate(self):
+        """
+          Returns (cut-offs / nodes, share of cut-offs made by the first
+          move tried).  The second number is the usual measure of how good
+          the move ordering is.
+        """
+        nodes = self.getNodes()
+        if nodes == 0: return 0.0, 0.0
+        firstRate = self.firstMoveCutoffs / float(self.cutoffs) if self.cutoffs else 0.0
+        return self.cutoffs / float(nodes), firstRate
+
+    def getEffectiveBranchingFactor(self):
+        "The effective branching factor per move, averaged over the moves."
+        if self.branchingMoves == 0: return 0.0
+        return self.branchingFactors / self.branchingMoves
+
+    def add(self, other):
+        "Adds other's counts to these."
+        if other is None: return
+        self.moves += other.moves
+        for ply, count in enumerate(other.nodesPerPly):
+            self.countNodes(ply, count)
+        self.evaluations += other.evaluations
+        self.cutoffs += other.cutoffs
+        self.firstMoveCutoffs += other.firstMoveCutoffs
+        self.ttHits += other.ttHits
+        self.branchingFactors += other.branchingFactors
+        self.branchingMoves += other.branchingMoves
+
+    def asDict(self):
+        return {'moves': self.moves, 'nodes': self.getNodes(), 'nodesPerPly': self.nodesPerPly,
+                'evaluations': self.evaluations, 'cutoffs': self.cutoffs,
+                'firstMoveCutoffs': self.firstMoveCutoffs, 'ttHits': self.ttHits,
+                'branchingFactor': self.getEffectiveBranchingFactor()}
 
 # DANIELA
 class MinimaxAgent(MultiAgentSearchAgent):
@@ -129,12 +540,43 @@ class MinimaxAgent(MultiAgentSearchAgent):
         Returns the minimax action from the current gameState using self.depth
         and self.evaluationFunction.
         """
+        self.startMove()
+        if self.transpositionTable is not None:
+            self.transpositionTable.newSearch()
+        if self.searchPool is not None:
+            action, _ = self.searchRootParallel(gameState, gameState.getLegalActions(0))
+            return action
         action, _ = self.minimax(gameState, 0)
         return action
+
+    def searchRootAction(self, gameState, action):
+        "Value of one root action, for searchRootParallel."
+        return self.minimax(gameState.generateSuccessor(0, action), 1)[1]
+
     def minimax(self, gameState, depth):
+        self.counters.countNodes(depth)
         # Ganamos, Perdiomos, o podemos continuar
-        if gameState.isWin() or gameState.isLose() or depth == self.depth:
-            return None, self.evaluationFunction(gameState)
+        if gameState.isWin() or gameState.isLose():
+            return None, self.evaluate(gameState)
+        if depth == self.depth:
+            self.depthCutoff = True
+            return None, self.evaluate(gameState)
+        table = self.transpositionTable
+        if table is not None:
+            entry = table.lookup(gameState, self.depth - depth, 0)
+            if entry is not None:
+                self.depthCutoff = self.depthCutoff or entry[3]
+                return entry[2], entry[1]
+        # Whether the search below this node reaches the depth limit, for its entry
+        outerCutoff, self.depthCutoff = self.depthCutoff, False
+        if self.depth - depth <= self.batchDepth:
+            # Pacman moves every ply of this search
+            bestAct, bestVal = self.searchFrontier(gameState, 0, self.depth - depth, 1, self.combineMax, ply=depth)
+            if table is not None:
+                table.store(gameState, self.depth - depth, 0, TranspositionTable.EXACT, bestVal, bestAct,
+                            self.depthCutoff)
+            self.depthCutoff = outerCutoff or self.depthCutoff
+            return bestAct, bestVal
         # movimientos de Pacman
         pacMoves = gameState.getLegalActions(0)
         # Evaluar todos los sucesores de Pac recursivamente
@@ -147,24 +589,324 @@ class MinimaxAgent(MultiAgentSearchAgent):
             if val > bestVal:
                 bestVal = val
                 bestAct = action
+        if table is not None:
+            table.store(gameState, self.depth - depth, 0, TranspositionTable.EXACT, bestVal, bestAct, self.depthCutoff)
+        self.depthCutoff = outerCutoff or self.depthCutoff
         return bestAct, bestVal
 
+class MoveOrdering:
+    """
+      Orders the moves of an alpha-beta node: the transposition table's move
+      first, then the killer moves recorded at this ply, then the remaining
+      moves by their history score.  Killers and history are kept separately
+      for each agent, so Pacman and ghost layers are ordered independently.
+
+      Plug in a different ordering with -a ordering=<ClassName>; it needs
+      the order, recordCutoff and clear methods below.
+    """
+    NUM_KILLERS = 2
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.killers = {}   # (agentIndex, ply) -> most recent cut-off moves
+        self.history = {}   # (agentIndex, position, action) -> score
+
+    def getPosition(self, gameState, agentIndex):
+        if agentIndex == 0:
+            return gameState.getPacmanPosition()
+        return gameState.getGhostPosition(agentIndex)
+
+    def order(self, gameState, agentIndex, ply, actions, hashMove=None):
+        position = self.getPosition(gameState, agentIndex)
+        history = self.history
+        ordered = sorted(actions, key=lambda a: -history.get((agentIndex, position, a), 0))
+        first = [hashMove] if hashMove in actions else []
+        for killer in self.killers.get((agentIndex, ply), ()):
+            if killer in actions and killer not in first:
+                first.append(killer)
+        return first + [a for a in ordered if a not in first]
+
+    def recordCutoff(self, gameState, agentIndex, ply, action, remainingDepth):
+        killers = self.killers.setdefault((agentIndex, ply), [])
+        if action in killers:
+            killers.remove(action)
+        killers.insert(0, action)
+        del killers[self.NUM_KILLERS:]
+        key = (agentIndex, self.getPosition(gameState, agentIndex), action)
+        self.history[key] = self.history.get(key, 0) + remainingDepth * remainingDepth
+
 class AlphaBetaAgent(MultiAgentSearchAgent):
     """
       Your minimax agent with alpha-beta pruning (question 3)
     """
 
+    # With split=ybwc, nodes with fewer plies than this below them are not
+    # worth shipping to the worker pool
+    YBWC_MIN_SPLIT_PLIES = 3
+
+    def __init__(self, evalFn = 'scoreEvaluationFunction', depth = '2', ordering = '', split = 'root', inPlace = '',
+                 verbose = '', **args):
+        MultiAgentSearchAgent.__init__(self, evalFn, depth, **args)
+        # Move ordering is opt-in (-a ordering=MoveOrdering) for the same
+        # reason as the transposition table
+        self.moveOrdering = util.lookup(ordering, globals())() if ordering else None
+        # How the worker pool (-a workers=<n>) is used: split=root searches
+        # the root moves in parallel, split=ybwc the younger brothers of any
+        # node once its eldest child has been searched
+        if split not in ('root', 'ybwc'):
+            raise Exception('Unknown split ' + str(split) + ': expected root or ybwc')
+        self.split = split
+        # inPlace=1 walks the tree on one state with GameState.doMove and
+        # undoMove instead of generating a successor per node
+        self.inPlace = inPlace not in ('', '0', 'False')
+        # verbose=1 prints the cut-off statistics after each game; they are
+        # always available from getGameCounters().getCutoffRate()
+        self.verbose = verbose not in ('', '0', 'False')
+
+    def registerInitialState(self, gameState):
+        MultiAgentSearchAgent.registerInitialState(self, gameState)
+        if self.moveOrdering is not None:
+            self.moveOrdering.clear()
+
+    def final(self, gameState):
+        MultiAgentSearchAgent.final(self, gameState)
+        if self.verbose:
+            counters = self.getGameCounters()
+            cutoffRate, firstRate = counters.getCutoffRate()
+            print('Alpha-beta: %d nodes, %d cut-offs (%.1f%%), %.1f%% on the first move' %
+                  (counters.getNodes(), counters.cutoffs, 100 * cutoffRate, 100 * firstRate))
+
     def getAction(self, gameState):
         """
           Returns the minimax action using self.depth and self.evaluationFunction
         """
-        "*** YOUR CODE HERE ***"
-        return None
+        self.startMove()
+        if self.transpositionTable is not None:
+            self.transpositionTable.newSearch()
+        if self.isIterative():
+            return self.iterativeDeepening(gameState, self.searchRoot)
+        action, _ = self.searchRoot(gameState)
+        return action
+
+    def searchRoot(self, gameState, actions=None):
+        if self.searchPool is not None and self.split == 'root':
+            return self.searchRootParallel(gameState, actions or gameState.getLegalActions(0))
+        if self.inPlace:
+            # A private state, so that a timeout leaves the game's untouched
+            gameState = GameState(gameState)
+        return self.alphabeta(gameState, 0, 0, float("-inf"), float("inf"), actions)
+
+    def searchRootAction(self, gameState, action):
+        """
+          Value of one root action, for searchRootParallel.  The action is
+          searched with the best root value any worker has found so far as
+          alpha, which prunes it as well as the serial search would or better
+          without changing which root action comes out best.
+        """
+        nextAgent = 1 % gameState.getNumAgents()
+        nextDepth = 1 if nextAgent == 0 else 0
+        alpha = parallelSearch.getSharedAlpha()
+        _, value = self.alphabeta(gameState.generateSuccessor(0, action), nextAgent, nextDepth, alpha, float("inf"))
+        parallelSearch.raiseSharedAlpha(value)
+        return value
+
+    def alphabeta(self, gameState, agentIndex, depth, alpha, beta, actions=None):
+        """
+          Returns (action, value) for agentIndex to move.  depth counts
+          completed rounds of Pacman plus every ghost.  Like the autograder's
+          reference, a node is pruned only on a strict inequality.  actions
+          overrides the order in which the moves of this node are tried.
+        """
+        self.checkDeadline()
+        self.counters.countNodes(depth * gameState.getNumAgents() + agentIndex)
+        if gameState.isWin() or gameState.isLose():
+            return None, self.evaluate(gameState)
+        if depth == self.depth:
+            self.depthCutoff = True
+            return None, self.evaluate(gameState)
+        table = self.transpositionTable
+        hashMove = None
+        entryCutoff = False
+        if table is not None:
+            entry = table.lookup(gameState, self.depth - depth, agentIndex)
+            if entry is not None:
+                flag, value, action, entryCutoff = entry
+                hashMove = action
+                self.depthCutoff = self.depthCutoff or entryCutoff
+                if flag == TranspositionTable.EXACT:
+                    return action, value
+                if flag == TranspositionTable.LOWER:
+                    alpha = max(alpha, value)
+                else:
+                    beta = min(beta, value)
+                if alpha > beta:
+                    return action, value
+        # The window this node is searched with, for classifying the result
+        alphaOrig, betaOrig = alpha, beta
+        # Whether the search below this node reaches the depth limit (or
+        # used a bound that did), for its entry
+        outerCutoff, self.depthCutoff = self.depthCutoff, entryCutoff
+
+        numAgents = gameState.getNumAgents()
+        nextAgent = (agentIndex + 1) % numAgents
+        nextDepth = depth + 1 if nextAgent == 0 else depth
+        ordering = self.moveOrdering
+        ply = depth * numAgents + agentIndex
+        if actions is None:
+            actions = gameState.getLegalActions(agentIndex)
+            if ordering is not None:
+                actions = ordering.order(gameState, agentIndex, ply, actions, hashMove)
+        bestAct = None
+        cutoffIndex = -1
+        split = (self.searchPool is not None and self.split == 'ybwc' and len(actions) > 1 and
+                 (self.depth - depth) * numAgents - agentIndex >= self.YBWC_MIN_SPLIT_PLIES)
+        if agentIndex == 0:
+            bestVal = float("-inf")
+            for i, action in enumerate(actions):
+                if i == 1 and split:
+                    bestVal, bestAct, cutoffIndex = self.searchYoungerBrothers(
+                        gameState, agentIndex, actions, nextAgent, nextDepth, alpha, beta, bestVal, bestAct)
+                    break
+                val = self.searchChild(gameState, agentIndex, action, nextAgent, nextDepth, alpha, beta)
+                if val > bestVal:
+                    bestVal, bestAct = val, action
+                if bestVal > beta:
+                    cutoffIndex = i
+                    break
+                alpha = max(alpha, bestVal)
+        else:
+            bestVal = float("inf")
+            for i, action in enumerate(actions):
+                if i == 1 and split:
+                    bestVal, bestAct, cutoffIndex = self.searchYoungerBrothers(
+                        gameState, agentIndex, actions, nextAgent, nextDepth, alpha, beta, bestVal, bestAct)
+                    break
+                val = self.searchChild(gameState, agentIndex, action, nextAgent, nextDepth, alpha, beta)
+                if val < bestVal:
+                    bestVal, bestAct = val, action
+                if bestVal < alpha:
+                    cutoffIndex = i
+                    break
+                beta = min(beta, bestVal)
+        if cutoffIndex >= 0:
+            self.counters.cutoffs += 1
+            if cutoffIndex == 0:
+                self.counters.firstMoveCutoffs += 1
+            if ordering is not None:
+                ordering.recordCutoff(gameState, agentIndex, ply, bestAct, self.depth - depth)
+
+        if table is not None:
+            if bestVal <= alphaOrig:
+                flag = TranspositionTable.UPPER
+            elif bestVal >= betaOrig:
+                flag = TranspositionTable.LOWER
+            else:
+                flag = TranspositionTable.EXACT
+            table.store(gameState, self.depth - depth, agentIndex, flag, bestVal, bestAct, self.depthCutoff)
+        self.depthCutoff = outerCutoff or self.depthCutoff
+        return bestAct, bestVal
+
+    def searchYoungerBrothers(self, gameState, agentIndex, actions, nextAgent, nextDepth, alpha, beta, bestVal, bestAct):
+        """
+          Young brothers wait: once the eldest child of a node has been
+          searched (and has narrowed the window), the remaining children are
+          searched at once in the worker pool with that window.  Results are
+          folded in as they arrive; the first one that cuts the node off
+          cancels the others.  Returns (bestVal, bestAct, cutoffIndex).
+        """
+        maximizing = agentIndex == 0
+        if maximizing:
+            alpha = max(alpha, bestVal)
+        else:
+            beta = min(beta, bestVal)
+        argsList = [(agentIndex, action, nextAgent, nextDepth, alpha, beta) for action in actions[1:]]
+        values = [None] * len(argsList)
+        pool = self.searchPool
+        results = pool.imapUnordered('searchChild', gameState, argsList, self.depth, self.deadline)
+        for i, (val, depthCutoff, timedOut, counters) in results:
+            self.counters.add(counters)
+            if timedOut:
+                pool.cancel()
+                raise SearchTimeout()
+            self.depthCutoff = self.depthCutoff or depthCutoff
+            if (val > beta) if maximizing else (val < alpha):
+                pool.cancel()
+                return val, actions[i + 1], i + 1
+            values[i] = val
+        for action, val in zip(actions[1:], values):
+            if (val > bestVal) if maximizing else (val < bestVal):
+                bestVal, bestAct = val, action
+        return bestVal, bestAct, -1
+
+    def searchChild(self, gameState, agentIndex, action, nextAgent, nextDepth, alpha, beta):
+        "Value of the child of a node that action leads to."
+        if self.inPlace:
+            gameState.doMove(agentIndex, action)
+            value = self.alphabeta(gameState, nextAgent, nextDepth, alpha, beta)[1]
+            gameState.undoMove()
+            return value
+        return self.alphabeta(gameState.generateSuccessor(agentIndex, action), nextAgent, nextDepth, alpha, beta)[1]
 
 class ExpectimaxAgent(MultiAgentSearchAgent):
     """
       Your expectimax agent (question 4)
     """
+    # With samples=<n> and tolerance=<t>, sampling a ghost layer stops early
+    # once at least this many samples agree to within t (95% confidence)
+    MIN_SAMPLES = 4
+
+    def __init__(self, evalFn = 'scoreEvaluationFunction', depth = '2', pruning = '', evalMin = '', evalMax = '',
+                 samples = '0', ghostModel = 'uniform', tolerance = '0', **args):
+        MultiAgentSearchAgent.__init__(self, evalFn, depth, **args)
+        # pruning=star1 or pruning=star2 cuts chance nodes off once the
+        # evaluation function's bounds show they cannot matter.  The bounds
+        # come from EVALUATION_BOUNDS, or are declared with evalMin/evalMax.
+        if pruning not in ('', 'star1', 'star2'):
+            raise Exception('Unknown pruning ' + str(pruning) + ': expected star1 or star2')
+        self.pruning = pruning
+        self.declaredBounds = None
+        if evalMin != '' or evalMax != '':
+            self.declaredBounds = (float(evalMin) if evalMin != '' else float("-inf"),
+                                   float(evalMax) if evalMax != '' else float("inf"))
+        # samples=<n> switches to sparse sampling: the moves of all the ghosts
+        # in a round form one chance layer, of which at most n joint outcomes
+        # are drawn from ghostModel (uniform, or a ghost agent of
+        # ghostAgents.py such as DirectionalGhost), so the cost of a search
+        # no longer grows with the number of ghosts
+        self.samples = int(samples)
+        if ghostModel != 'uniform' and not hasattr(ghostAgents, ghostModel):
+            raise Exception('Unknown ghostModel ' + str(ghostModel) + ': expected uniform or a ghost agent in ghostAgents.py')
+        self.ghostModel = ghostModel
+        self.ghostModels = {}
+        self.tolerance = float(tolerance)
+
+    def samplesMoves(self):
+        return self.samples > 0
+
+    def evaluationBounds(self, gameState, pacmanMoves, ghostMoves):
+        """
+          (lo, hi) bounds on the evaluation of every state reached from
+          gameState within the given numbers of Pacman and ghost moves.
+        """
+        if self.declaredBounds is not None:
+            return self.declaredBounds
+        boundsFn = EVALUATION_BOUNDS.get(self.evaluationFunction)
+        if boundsFn is None:
+            return float("-inf"), float("inf")
+        return boundsFn(gameState, pacmanMoves, ghostMoves)
+
+    def combineExpectation(agentIndex, actions, values):
+        "Pacman takes the first best action, a ghost averages over its moves."
+        if agentIndex == 0:
+            return MultiAgentSearchAgent.combineMax(agentIndex, actions, values)
+        value = 0.0
+        for val in values:
+            value += val
+        return None, value / len(values)
+    combineExpectation = staticmethod(combineExpectation)
+
     def getAction(self, gameState):
         """
           Returns the expectimax action using self.depth and self.evaluationFunction
@@ -172,11 +914,430 @@ class ExpectimaxAgent(MultiAgentSearchAgent):
           All ghosts should be modeled as choosing uniformly at random from their
           legal moves.
         """
-        "*** YOUR CODE HERE ***"
-        action, _ = self.expectimax(gameState, 0, 0)
+        self.startMove()
+        if self.transpositionTable is not None:
+            self.transpositionTable.newSearch()
+        if self.isIterative():
+            return self.iterativeDeepening(gameState, self.searchRoot)
+        action, _ = self.searchRoot(gameState)
         return action
-    def expectimax(self, game_state, agent_index, depth):
-            return None
+
+    def searchRoot(self, gameState, actions=None):
+        if self.searchPool is not None:
+            return self.searchRootParallel(gameState, actions or gameState.getLegalActions(0))
+        if self.samples > 0:
+            return self.expectimaxSparse(gameState, 0, actions)
+        if self.pruning:
+            return self.expectimaxStar(gameState, 0, 0, float("-inf"), float("inf"), actions)
+        return self.expectimax(gameState, 0, 0, actions)
+
+    def searchRootAction(self, gameState, action):
+        "Value of one root action, for searchRootParallel."
+        nextAgent = 1 % gameState.getNumAgents()
+        nextDepth = 1 if nextAgent == 0 else 0
+        successor = gameState.generateSuccessor(0, action)
+        if self.samples > 0:
+            return self.sampleGhostLayer(successor, 0)
+        if self.pruning:
+            return self.expectimaxStar(successor, nextAgent, nextDepth, float("-inf"), float("inf"))[1]
+        return self.expectimax(successor, nextAgent, nextDepth)[1]
+    def expectimax(self, gameState, agentIndex, depth, actions=None):
+        """
+          Returns (action, value): Pacman maximizes, each ghost is a chance
+          node averaging over its legal moves.  depth counts completed rounds.
+          actions overrides the order in which Pacman's moves are tried.
+        """
+        self.checkDeadline()
+        self.counters.countNodes(depth * gameState.getNumAgents() + agentIndex)
+        if gameState.isWin() or gameState.isLose():
+            return None, self.evaluate(gameState)
+        if depth == self.depth:
+            self.depthCutoff = True
+            return None, self.evaluate(gameState)
+        table = self.transpositionTable
+        if table is not None:
+            entry = table.lookup(gameState, self.depth - depth, agentIndex)
+            if entry is not None:
+                self.depthCutoff = self.depthCutoff or entry[3]
+                return entry[2], entry[1]
+        # Whether the search below this node reaches the depth limit, for its entry
+        outerCutoff, self.depthCutoff = self.depthCutoff, False
+        if agentIndex == 0 and self.depth - depth <= self.batchDepth:
+            numAgents = gameState.getNumAgents()
+            bestAct, value = self.searchFrontier(gameState, 0, (self.depth - depth) * numAgents, numAgents,
+                                                 self.combineExpectation, actions, depth * numAgents)
+            if table is not None:
+                table.store(gameState, self.depth - depth, agentIndex, TranspositionTable.EXACT, value, bestAct,
+                            self.depthCutoff)
+            self.depthCutoff = outerCutoff or self.depthCutoff
+            return bestAct, value
+
+        nextAgent = (agentIndex + 1) % gameState.getNumAgents()
+        nextDepth = depth + 1 if nextAgent == 0 else depth
+        if actions is None:
+            actions = gameState.getLegalActions(agentIndex)
+        bestAct = None
+        if agentIndex == 0:
+            value = float("-inf")
+            for action in actions:
+                _, val = self.expectimax(gameState.generateSuccessor(agentIndex, action), nextAgent, nextDepth)
+                if val > value:
+                    value, bestAct = val, action
+        else:
+            value = 0.0
+            for action in actions:
+                _, val = self.expectimax(gameState.generateSuccessor(agentIndex, action), nextAgent, nextDepth)
+                value += val
+            value /= len(actions)
+
+        if table is not None:
+            table.store(gameState, self.depth - depth, agentIndex, TranspositionTable.EXACT, value, bestAct,
+                        self.depthCutoff)
+        self.depthCutoff = outerCutoff or self.depthCutoff
+        return bestAct, value
+
+    def expectimaxStar(self, gameState, agentIndex, depth, alpha, beta, actions=None, firstValue=None):
+        """
+          Expectimax with Star1 (pruning=star1) or Star2 (pruning=star2)
+          pruning of the ghost chance nodes.  Returns (action, value) where,
+          as in AlphaBetaAgent.alphabeta, a value in [alpha, beta] is the
+          exact expectimax value, a value below alpha an upper bound and a
+          value above beta a lower bound; the root is searched with an
+          infinite window, so its value is exact.  firstValue, if given, is
+          the exact value of Pacman's first action (found by a Star2 probe).
+        """
+        self.checkDeadline()
+        self.counters.countNodes(depth * gameState.getNumAgents() + agentIndex)
+        if gameState.isWin() or gameState.isLose():
+            return None, self.evaluate(gameState)
+        if depth == self.depth:
+            self.depthCutoff = True
+            return None, self.evaluate(gameState)
+        table = self.transpositionTable
+        entryCutoff = False
+        if table is not None:
+            entry = table.lookup(gameState, self.depth - depth, agentIndex)
+            if entry is not None:
+                flag, value, action, entryCutoff = entry
+                self.depthCutoff = self.depthCutoff or entryCutoff
+                if flag == TranspositionTable.EXACT:
+                    return action, value
+                if flag == TranspositionTable.LOWER:
+                    alpha = max(alpha, value)
+                else:
+                    beta = min(beta, value)
+                if alpha > beta:
+                    return action, value
+        alphaOrig, betaOrig = alpha, beta
+        # Whether the search below this node reaches the depth limit (or used
+        # a bound that did), for its entry.  A Star2 probe's firstValue was
+        # searched before this node, so it is taken to have.
+        outerCutoff, self.depthCutoff = self.depthCutoff, entryCutoff or firstValue is not None
+
+        nextAgent = (agentIndex + 1) % gameState.getNumAgents()
+        nextDepth = depth + 1 if nextAgent == 0 else depth
+        if actions is None:
+            actions = gameState.getLegalActions(agentIndex)
+        bestAct = None
+        if agentIndex == 0:
+            value = float("-inf")
+            for i, action in enumerate(actions):
+                if i == 0 and firstValue is not None:
+                    val = firstValue
+                else:
+                    _, val = self.expectimaxStar(gameState.generateSuccessor(agentIndex, action), nextAgent,
+                                                 nextDepth, max(alpha, value), beta)
+                if val > value:
+                    value, bestAct = val, action
+                if value > beta:
+                    self.counters.cutoffs += 1
+                    break
+        else:
+            value = self.starChanceValue(gameState, agentIndex, depth, actions, alpha, beta, nextAgent, nextDepth)
+
+        if table is not None:
+            if value < alphaOrig:
+                flag = TranspositionTable.UPPER
+            elif value > betaOrig:
+                flag = TranspositionTable.LOWER
+            else:
+                flag = TranspositionTable.EXACT
+            table.store(gameState, self.depth - depth, agentIndex, flag, value, bestAct, self.depthCutoff)
+        self.depthCutoff = outerCutoff or self.depthCutoff
+        return bestAct, value
+
+    def expectimaxSparse(self, gameState, depth, actions=None):
+        """
+          Returns (action, value) of the Pacman node at round depth with every
+          ghost layer below it estimated by sampleGhostLayer.
+        """
+        self.checkDeadline()
+        self.counters.countNodes(2 * depth)
+        if gameState.isWin() or gameState.isLose():
+            return None, self.evaluate(gameState)
+        if depth == self.depth:
+            self.depthCutoff = True
+            return None, self.evaluate(gameState)
+        if actions is None:
+            actions = gameState.getLegalActions(0)
+        bestAct, value = None, float("-inf")
+        for action in actions:
+            val = self.sampleGhostLayer(gameState.generateSuccessor(0, action), depth)
+            if val > value:
+                value, bestAct = val, action
+        return bestAct, value
+
+    def sampleGhostLayer(self, gameState, depth):
+        """
+          Estimated value of gameState, where Pacman has just moved in round
+          depth and the ghosts move next.  Draws up to self.samples joint
+          ghost moves and averages the values of the states they lead to.  A
+          joint move drawn again reuses its value, and with a tolerance the
+          sampling stops once the 95% confidence interval of the average is
+          that narrow.  When the ghosts have no more joint moves than
+          samples and are modeled as uniform, the layer is averaged exactly.
+        """
+        self.counters.countNodes(2 * depth + 1)
+        if gameState.isWin() or gameState.isLose():
+            return self.evaluate(gameState)
+        numAgents = gameState.getNumAgents()
+        if numAgents == 1:
+            return self.expectimaxSparse(gameState, depth + 1)[1]
+        if self.ghostModel == 'uniform':
+            outcomes = 1
+            for ghost in range(1, numAgents):
+                outcomes *= len(gameState.getLegalActions(ghost))
+            if outcomes <= self.samples:
+                return self.averageGhostMoves(gameState, 1, depth)
+
+        states = {(): gameState}   # joint move prefix -> state
+        values = {}                 # joint move -> value
+        total, squares, count = 0.0, 0.0, 0
+        for k in range(self.samples):
+            self.checkDeadline()
+            state, joint = gameState, ()
+            for ghost in range(1, numAgents):
+                if state.isWin() or state.isLose():
+                    break
+                joint += (self.sampleGhostAction(state, ghost),)
+                if joint not in states:
+                    states[joint] = state.generateSuccessor(ghost, joint[-1])
+                state = states[joint]
+            if joint not in values:
+                values[joint] = self.expectimaxSparse(state, depth + 1)[1]
+            value = values[joint]
+            total, squares, count = total + value, squares + value * value, count + 1
+            if self.tolerance > 0 and count >= self.MIN_SAMPLES and \
+                    self.confidenceWidth(total, squares, count) <= self.tolerance:
+                break
+        return total / count
+
+    def averageGhostMoves(self, gameState, ghost, depth):
+        "Exact average over the uniform moves of ghosts ghost, ghost+1, ..."
+        if gameState.isWin() or gameState.isLose():
+            return self.evaluate(gameState)
+        if ghost == gameState.getNumAgents():
+            return self.expectimaxSparse(gameState, depth + 1)[1]
+        actions = gameState.getLegalActions(ghost)
+        value = 0.0
+        for action in actions:
+            value += self.averageGhostMoves(gameState.generateSuccessor(ghost, action), ghost + 1, depth)
+        return value / len(actions)
+
+    def sampleGhostAction(self, gameState, ghost):
+        if self.ghostModel == 'uniform':
+            return self.random.choice(gameState.getLegalActions(ghost))
+        if ghost not in self.ghostModels:
+            self.ghostModels[ghost] = getattr(ghostAgents, self.ghostModel)(ghost)
+        return util.chooseFromDistribution(self.ghostModels[ghost].getDistribution(gameState), self.random)
+
+    def confidenceWidth(total, squares, count):
+        "Half width of the 95% confidence interval of a mean, from the sums of the samples and their squares."
+        variance = max(0.0, (squares - total * total / count) / (count - 1))
+        return 1.96 * (variance / count) ** 0.5
+    confidenceWidth = staticmethod(confidenceWidth)
+
+    def starChanceValue(self, gameState, agentIndex, depth, actions, alpha, beta, nextAgent, nextDepth):
+        """
+          Value of a ghost chance node for expectimaxStar.  Every child's
+          value lies within the evaluation bounds [lo, hi], so once the
+          children searched so far fix the average below alpha (or above
+          beta) whatever the rest turn out to be, the node is cut off (Star1).
+          Star2 first probes the first Pacman move of every child, which
+          gives lower bounds better than lo, and may cut off from those.
+        """
+        n = len(actions)
+        numAgents = gameState.getNumAgents()
+        pacmanMoves = self.depth - depth - 1
+        lo, hi = self.evaluationBounds(gameState, pacmanMoves,
+                                       (numAgents - agentIndex) + pacmanMoves * (numAgents - 1))
+        lower = [lo] * n
+        firstValues = [None] * n
+        successors = [gameState.generateSuccessor(agentIndex, action) for action in actions]
+
+        if self.pruning == 'star2' and nextAgent == 0 and nextDepth < self.depth:
+            probed = 0.0
+            for i, successor in enumerate(successors):
+                restLower = (n - i - 1) * lo if i < n - 1 else 0.0
+                if successor.isWin() or successor.isLose():
+                    lower[i] = self.evaluate(successor)
+                else:
+                    childAlpha = n * alpha - probed - ((n - i - 1) * hi if i < n - 1 else 0.0)
+                    childBeta = n * beta - probed - restLower
+                    first = successor.getLegalActions(0)[0]
+                    _, val = self.expectimaxStar(successor.generateSuccessor(0, first), 1 % numAgents,
+                                                 nextDepth, childAlpha, childBeta)
+                    if val > childBeta:
+                        self.counters.cutoffs += 1
+                        return (probed + val + restLower) / n
+                    if val >= childAlpha:
+                        lower[i] = max(lo, val)
+                        firstValues[i] = val
+                probed += lower[i]
+
+        total = 0.0
+        restLower = sum(lower)
+        for i, successor in enumerate(successors):
+            restLower -= lower[i]
+            restUpper = (n - i - 1) * hi if i < n - 1 else 0.0
+            if i == n - 1:
+                restLower = 0.0
+            childAlpha = n * alpha - total - restUpper
+            childBeta = n * beta - total - restLower
+            _, val = self.expectimaxStar(successor, nextAgent, nextDepth, childAlpha, childBeta,
+                                         firstValue=firstValues[i])
+            if val < childAlpha:
+                self.counters.cutoffs += 1
+                return (total + val + restUpper) / n
+            if val > childBeta:
+                self.counters.cutoffs += 1
+                return (total + val + restLower) / n
+            total += val
+        return total / n
+
+class MonteCarloNode:
+    """
+      A node of MonteCarloAgent's search tree: a state, the agent to move in
+      it, the children expanded so far by action, the actions not expanded
+      yet (in an order drawn from rng), and the playout statistics.
+    """
+    def __init__(self, gameState, agentIndex, rng, parent=None):
+        self.gameState = gameState
+        self.agentIndex = agentIndex
+        self.parent = parent
+        self.children = {}
+        if gameState.isWin() or gameState.isLose():
+            self.untried = []
+        else:
+            self.untried = gameState.getLegalActions(agentIndex)
+            rng.shuffle(self.untried)
+        self.visits = 0
+        self.totalValue = 0.0
+
+    def getMeanValue(self):
+        return self.totalValue / self.visits
+
+class MonteCarloAgent(MultiAgentSearchAgent):
+    """
+      An anytime Monte Carlo tree search (UCT) agent.  Pacman's moves are
+      chosen with UCB1 and the ghosts are chance nodes whose moves are drawn
+      uniformly, as ExpectimaxAgent models them.  Each playout adds one node
+      to the tree, continues from it with random moves on a
+      simulator.RolloutSimulator for rolloutDepth rounds and scores the
+      state it reaches with evalFn.
+
+      The search runs for moveTime seconds (auto: a share of the rules' move
+      timeout) and plays the most visited move.  The subtree below that move
+      is kept, and the next turn starts from the node matching the state the
+      ghosts actually left.
+    """
+    def __init__(self, evalFn = 'betterEvaluationFunction', depth = '2', moveTime = 'auto', rolloutDepth = '10',
+                 exploration = '1.0', **args):
+        MultiAgentSearchAgent.__init__(self, evalFn, depth, moveTime=moveTime, **args)
+        self.rolloutDepth = int(rolloutDepth)
+        self.exploration = float(exploration)
+        self.tree = None
+        self.playouts = 0
+
+    def samplesMoves(self):
+        return True
+
+    def registerInitialState(self, gameState):
+        MultiAgentSearchAgent.registerInitialState(self, gameState)
+        self.tree = None
+
+    def getAction(self, gameState):
+        self.startMove()
+        root = self.findRoot(gameState)
+        self.counters.countNodes(0)
+        deadline = time.perf_counter() + self.getMoveBudget()
+        # The range of the values seen so far scales UCB1's exploration term
+        self.minValue, self.maxValue = float("inf"), float("-inf")
+        self.playouts = 0
+        while root.untried or time.perf_counter() < deadline:
+            self.playout(root)
+            self.playouts += 1
+        action = max(root.children, key=lambda a: (root.children[a].visits, root.children[a].getMeanValue()))
+        self.tree = root.children[action]
+        return action
+
+    def findRoot(self, gameState):
+        "The kept node for gameState, found among the ghost moves below the last move played, or a new root."
+        frontier = [self.tree] if self.tree is not None else []
+        while frontier:
+            node = frontier.pop()
+            if node.agentIndex == 0:
+                if node.gameState == gameState:
+                    node.parent = None
+                    return node
+            else:
+                frontier.extend(node.children.values())
+        return MonteCarloNode(gameState, 0, self.random)
+
+    def playout(self, root):
+        node, ply = root, 0
+        # Selection
+        while not node.untried and node.children:
+            node = self.selectChild(node)
+            ply += 1
+        # Expansion
+        if node.untried:
+            action = node.untried.pop()
+            successor = node.gameState.generateSuccessor(node.agentIndex, action)
+            child = MonteCarloNode(successor, (node.agentIndex + 1) % successor.getNumAgents(), self.random, node)
+            node.children[action] = child
+            node = child
+            self.counters.countNodes(ply + 1)
+        # Simulation
+        value = self.rollout(node.gameState, node.agentIndex)
+        self.minValue = min(self.minValue, value)
+        self.maxValue = max(self.maxValue, value)
+        # Backpropagation
+        while node is not None:
+            node.visits += 1
+            node.totalValue += value
+            node = node.parent
+
+    def selectChild(self, node):
+        if node.agentIndex != 0:
+            return self.random.choice(list(node.children.values()))
+        scale = self.maxValue - self.minValue
+        if scale <= 0:
+            scale = 1.0
+        logVisits = math.log(node.visits)
+        return max(node.children.values(), key=lambda child:
+                   (child.getMeanValue() - self.minValue) / scale +
+                   self.exploration * math.sqrt(logVisits / child.visits))
+
+    def rollout(self, gameState, agentIndex):
+        """
+          Plays rolloutDepth rounds of random moves (Pacman neither stops nor
+          turns back unless he has to) on a RolloutSimulator and evaluates
+          where they end.
+        """
+        rollout = simulator.RolloutSimulator(gameState)
+        rollout.playout(agentIndex, self.rolloutDepth * gameState.getNumAgents(), self.random)
+        return self.evaluate(rollout.toGameState())
 
 # DANIELA 
 def betterEvaluationFunction(currentGameState):
@@ -210,4 +1371,75 @@ def betterEvaluationFunction(currentGameState):
     return score
 
 # Abbreviation
-better = betterEvaluationFunction
\ No newline at end of file
+better = betterEvaluationFunction
+
+def evaluateStates(evalFn, gameStates):
+    """
+    Returns the list of evalFn values of gameStates: one NumPy pass for the
+    evaluation functions of this file that vectorEvaluation implements, and
+    a loop over evalFn otherwise.
+    """
+    if vectorEvaluation.NUMPY_AVAILABLE and gameStates:
+        batchFn = BATCH_EVALUATION_FUNCTIONS.get(evalFn)
+        if batchFn is not None:
+            return batchFn(gameStates).tolist()
+    return [evalFn(gameState) for gameState in gameStates]
+
+def scoreBounds(gameState, pacmanMoves, ghostMoves):
+    """
+      Bounds on the score of any state reached from gameState within the
+      given numbers of Pacman and ghost moves, from the score changes in
+      pacman.py: each Pacman move costs TIME_PENALTY and may eat a pellet
+      (+10), the last one winning (+500); eating a scared ghost gives +200
+      and being caught -500 per ghost that catches Pacman.  Only ghosts
+      that can reach Pacman in time can catch him, and only capsules he
+      can reach in time can scare the ghosts again.  A win ends the game,
+      so the best line pays the time penalty only for the moves up to it.
+    """
+    score = gameState.getScore()
+    if gameState.isWin() or gameState.isLose() or pacmanMoves + ghostMoves == 0:
+        return score, score
+    pacmanPos = gameState.getPacmanPosition()
+    ghostStates = gameState.getGhostStates()
+    # One move of slack for the half-speed positions of scared ghosts
+    reach = pacmanMoves + ghostMoves + 1
+    nearGhosts = [ghost for ghost in ghostStates
+                  if gameState.getMazeDistance(pacmanPos, ghost.getPosition()) <= reach]
+    capsules = [capsule for capsule in gameState.getCapsules()
+                if gameState.getMazeDistance(pacmanPos, capsule) <= pacmanMoves]
+    # A ghost is eaten at most once while scared, and scared again only by a capsule
+    eats = len([ghost for ghost in nearGhosts if ghost.scaredTimer > 0]) + len(capsules) * len(ghostStates)
+
+    food = gameState.getNumFood()
+    # Each move pays TIME_PENALTY and eats at most one pellet, and the game
+    # ends once the last one is eaten
+    upper = score + (10 - TIME_PENALTY) * min(pacmanMoves, food) + 200 * eats
+    if 0 < food <= pacmanMoves:
+        upper += 500
+    return score - TIME_PENALTY * pacmanMoves - 500 * len(nearGhosts), upper
+
+def betterEvaluationBounds(gameState, pacmanMoves, ghostMoves):
+    "Bounds on betterEvaluationFunction, term by term on top of scoreBounds."
+    if gameState.isWin() or gameState.isLose() or pacmanMoves + ghostMoves == 0:
+        value = betterEvaluationFunction(gameState)
+        return value, value
+    lower, upper = scoreBounds(gameState, pacmanMoves, ghostMoves)
+    # Ghosts that may end up next to Pacman (proximityToGhosts)
+    pacmanPos = gameState.getPacmanPosition()
+    reach = pacmanMoves + ghostMoves + 1
+    close = len([ghost for ghost in gameState.getGhostPositions() if manhattanDistance(pacmanPos, ghost) <= reach + 1])
+    return lower - 1 - close - len(gameState.getCapsules()), upper + 1
+
+# Bounds on the evaluation functions above, as functions of (gameState,
+# pacmanMoves, ghostMoves) covering every state reached within those moves
+# (used by ExpectimaxAgent's pruning=star1/star2)
+EVALUATION_BOUNDS = {
+    scoreEvaluationFunction: scoreBounds,
+    betterEvaluationFunction: betterEvaluationBounds,
+}
+
+# Vectorized forms of the evaluation functions above (see vectorEvaluation.py)
+BATCH_EVALUATION_FUNCTIONS = {}
+if vectorEvaluation.NUMPY_AVAILABLE:
+    BATCH_EVALUATION_FUNCTIONS[scoreEvaluationFunction] = vectorEvaluation.scoreEvaluationBatch
+    BATCH_EVALUATION_FUNCTIONS[betterEvaluationFunction] = vectorEvaluation.betterEvaluationBatch
@@ -467,7 +467,8 @@ class EvalAgentTest(testClasses.TestCase):
 
         stats = {'time': totalTime, 'wins': [g.state.isWin() for g in games].count(True),
                  'games': games, 'scores': [g.state.getScore() for g in games],
-                 'timeouts': [g.agentTimeout for g in games].count(True), 'crashes': [g.agentCrashed for g in games].count(True)}
+                 'timeouts': [g.agentTimeout for g in games].count(True), 'crashes': [g.agentCrashed for g in games].count(True),
+                 'search': [g.searchCounters[0] for g in games if g.searchCounters[0] is not None]}
 
         averageScore = sum(stats['scores']) / float(len(stats['scores']))
         nonTimeouts = self.numGames - stats['timeouts']
@@ -512,6 +513,15 @@ class EvalAgentTest(testClasses.TestCase):
                 for idx, threshold in enumerate(thresholds):
                     self.addMessage("    >= %s:  %s points" % (threshold, idx+1))
 
+        # Not graded: how much the agent searched (multiAgents.SearchCounters)
+        if len(stats['search']) > 0:
+            search = stats['search'][0].__class__()
+            for counters in stats['search']:
+                search.add(counters)
+            moves = float(max(1, search.moves))
+            self.addMessage("Search: %.0f nodes and %.0f evaluations per move, effective branching factor %.2f" %
+                            (search.getNodes() / moves, search.evaluations / moves, search.getEffectiveBranchingFactor()))
+
         if any([not passed for passed, _, _, _, _, _ in results]):
             totalPoints = 0
 
@@ -41,6 +41,7 @@ The keys are 'a', 's', 'd', and 'w' to move (or arrow keys).  Have fun!
 """
 from game import GameStateData
 from game import Game
+from game import Configuration
 from game import Directions
 from game import Actions
 from util import nearestPoint
@@ -98,31 +99,76 @@ class GameState:
         # Check that successors exist
         if self.isWin() or self.isLose(): raise Exception('Can\'t generate a successor of a terminal state.')
 
-        # Copy current state
+        # Copy current state; only the moving agent gets a private AgentState
         state = GameState(self)
+        state.applyMove( agentIndex, action )
+        GameState.explored.add(self)
+        GameState.explored.add(state)
+        return state
+
+    # The record of each doMove not yet undone (created on the first doMove)
+    undoStack = None
+
+    def doMove( self, agentIndex, action ):
+        """
+        Applies the action to this state in place, as generateSuccessor does to
+        a copy, and records what it changes so that undoMove can take it back.
+        The rules replace (rather than mutate) the food, capsules and
+        AgentStates they change, so the states this one shares them with are
+        not affected.  Unlike generateSuccessor, doMove does not add states to
+        GameState.explored; don't keep a state in a set or as a dict key while
+        moving it.
+        """
+        if self.isWin() or self.isLose(): raise Exception('Can\'t move in a terminal state.')
+        data = self.data
+        if self.undoStack is None:
+            self.undoStack = []
+        # The agents (configurations and scared timers), food, capsules, score
+        # and flags the move may replace, as references
+        self.undoStack.append( ( data.agentStates, data.food, data.capsules, data.score, data._win, data._lose,
+                                 data._zobrist, data._eaten, data._agentMoved, data._foodEaten, data._capsuleEaten ) )
+        data.agentStates = data.agentStates[:]
+        data.scoreChange = 0
+        data._foodEaten = None
+        data._capsuleEaten = None
+        self.applyMove( agentIndex, action )
+
+    def undoMove( self ):
+        "Takes back the last doMove."
+        data = self.data
+        ( data.agentStates, data.food, data.capsules, data.score, data._win, data._lose,
+          data._zobrist, data._eaten, data._agentMoved, data._foodEaten, data._capsuleEaten ) = self.undoStack.pop()
+        data.scoreChange = 0
+
+    def applyMove( self, agentIndex, action ):
+        """
+        Moves the agent by the rules on this state's data, which must not share
+        its agentStates list with another state.
+        """
+        data = self.data
+        data.toggleAgentHash( agentIndex )
+        data.copyAgentState( agentIndex )
 
         # Let agent's logic deal with its action's effects on the board
         if agentIndex == 0:  # Pacman is moving
-            state.data._eaten = [False for i in range(state.getNumAgents())]
-            PacmanRules.applyAction( state, action )
+            data._eaten = [False for i in range(self.getNumAgents())]
+            PacmanRules.applyAction( self, action )
         else:                # A ghost is moving
-            GhostRules.applyAction( state, action, agentIndex )
+            GhostRules.applyAction( self, action, agentIndex )
 
         # Time passes
         if agentIndex == 0:
-            state.data.scoreChange += -TIME_PENALTY # Penalty for waiting around
+            data.scoreChange += -TIME_PENALTY # Penalty for waiting around
         else:
-            GhostRules.decrementTimer( state.data.agentStates[agentIndex] )
+            GhostRules.decrementTimer( data.agentStates[agentIndex] )
+        data.toggleAgentHash( agentIndex )
 
         # Resolve multi-agent effects
-        GhostRules.checkDeath( state, agentIndex )
+        GhostRules.checkDeath( self, agentIndex )
 
         # Book keeping
-        state.data._agentMoved = agentIndex
-        state.data.score += state.data.scoreChange
-        GameState.explored.add(self)
-        GameState.explored.add(state)
-        return state
+        data._agentMoved = agentIndex
+        data.score += data.scoreChange
 
     def getLegalPacmanActions( self ):
         return self.getLegalActions( 0 )
@@ -171,7 +217,7 @@ class GameState:
         """
         Returns a list of positions (x,y) of the remaining capsules.
         """
-        return self.data.capsules
+        return list(self.data.capsules)
 
     def getNumFood( self ):
         return self.data.food.count()
@@ -200,8 +246,16 @@ class GameState:
         """
         return self.data.layout.walls
 
+    def getMazeDistance( self, pos1, pos2 ):
+        """
+        Returns the length of the shortest path between two positions through
+        the maze.  The all-pairs table behind it is built once per layout, so
+        this is a constant-time lookup.
+        """
+        return self.data.layout.getMazeDistance( pos1, pos2 )
+
     def hasFood(self, x, y):
-        return self.data.food[x][y]
+        return self.data.food.isSet(x, y)
 
     def hasWall(self, x, y):
         return self.data.layout.walls[x][y]
@@ -231,6 +285,14 @@ class GameState:
         state.data = self.data.deepCopy()
         return state
 
+    def snapshot( self ):
+        """
+        A copy like deepCopy that shares the layout (see GameStateData.snapshot).
+        """
+        state = GameState( self )
+        state.data = self.data.snapshot()
+        return state
+
     def __eq__( self, other ):
         """
         Allows two states to be compared.
@@ -268,14 +330,20 @@ class ClassicGameRules:
     These game rules manage the control flow of a game, deciding when
     and how the game starts and ends.
     """
-    def __init__(self, timeout=30):
+    def __init__(self, timeout=30, telemetry=None):
         self.timeout = timeout
+        # Where games record their moves (a telemetry.TelemetrySink), if anywhere
+        self.telemetry = telemetry
 
     def newGame( self, layout, pacmanAgent, ghostAgents, display, quiet = False, catchExceptions=False):
         agents = [pacmanAgent] + ghostAgents[:layout.getNumGhosts()]
         initState = GameState()
         initState.initialize( layout, len(ghostAgents) )
-        game = Game(agents, display, self, catchExceptions=catchExceptions)
+        game = Game(agents, display, self, catchExceptions=catchExceptions, telemetry=self.telemetry)
+        for index, agent in enumerate(agents):
+            # Let time-aware agents (iterative deepening) size their search
+            if 'setMoveTimeout' in dir(agent):
+                agent.setMoveTimeout(self.getMoveTimeout(index))
         game.state = initState
         self.initialState = initState.deepCopy()
         self.quiet = quiet
@@ -331,7 +399,11 @@ class PacmanRules:
         """
         Returns a list of possible actions.
         """
-        return Actions.getPossibleActions( state.getPacmanState().configuration, state.data.layout.walls )
+        conf = state.data.agentStates[0].configuration
+        actions = state.data.layout.getActionTables()[0].get( conf.pos )
+        if actions is None:
+            return Actions.getPossibleActions( conf, state.data.layout.walls )
+        return list( actions )
     getLegalActions = staticmethod( getLegalActions )
 
     def applyAction( state, action ):
@@ -359,23 +431,25 @@ class PacmanRules:
     def consume( position, state ):
         x,y = position
         # Eat food
-        if state.data.food[x][y]:
+        if state.data.food.isSet(x, y):
             state.data.scoreChange += 10
-            state.data.food = state.data.food.copy()
-            state.data.food[x][y] = False
+            # The parent's food is shared, so eating builds a new bitboard
+            state.data.food = state.data.food.without(x, y)
+            state.data.toggleHash( ('food', x, y) )
             state.data._foodEaten = position
-            # TODO: cache numFood?
-            numFood = state.getNumFood()
-            if numFood == 0 and not state.data._lose:
+            if state.data.food.bits == 0 and not state.data._lose:
                 state.data.scoreChange += 500
                 state.data._win = True
         # Eat capsule
-        if( position in state.getCapsules() ):
-            state.data.capsules.remove( position )
+        if( position in state.data.capsules ):
+            state.data.capsules = tuple( c for c in state.data.capsules if c != position )
+            state.data.toggleHash( ('capsule', x, y) )
             state.data._capsuleEaten = position
             # Reset all ghosts' scared timers
             for index in range( 1, len( state.data.agentStates ) ):
-                state.data.agentStates[index].scaredTimer = SCARED_TIME
+                state.data.toggleAgentHash( index )
+                state.data.copyAgentState( index ).scaredTimer = SCARED_TIME
+                state.data.toggleAgentHash( index )
     consume = staticmethod( consume )
 
 class GhostRules:
@@ -389,6 +463,10 @@ class GhostRules:
         reach a dead end, but can turn 90 degrees at intersections.
         """
         conf = state.getGhostState( ghostIndex ).configuration
+        byDirection = state.data.layout.getActionTables()[1].get( conf.pos )
+        if byDirection is not None:
+            return list( byDirection[conf.direction] )
+        # In between grid points (a scared ghost at half speed)
         possibleActions = Actions.getPossibleActions( conf, state.data.layout.walls )
         reverse = Actions.reverseDirection( conf.direction )
         if Directions.STOP in possibleActions:
@@ -414,7 +492,8 @@ class GhostRules:
     def decrementTimer( ghostState):
         timer = ghostState.scaredTimer
         if timer == 1:
-            ghostState.configuration.pos = nearestPoint( ghostState.configuration.pos )
+            conf = ghostState.configuration
+            ghostState.configuration = Configuration( nearestPoint( conf.pos ), conf.direction )
         ghostState.scaredTimer = max( 0, timer - 1 )
     decrementTimer = staticmethod( decrementTimer )
 
@@ -435,10 +514,15 @@ class GhostRules:
 
     def collide( state, ghostState, agentIndex):
         if ghostState.scaredTimer > 0:
+            # The eaten ghost may still be shared with the parent state
+            state.data.toggleAgentHash( agentIndex )
+            ghostState = state.data.copyAgentState( agentIndex )
             state.data.scoreChange += 200
             GhostRules.placeGhost(state, ghostState)
             ghostState.scaredTimer = 0
+            state.data.toggleAgentHash( agentIndex )
             # Added for first-person
+            state.data._eaten = state.data._eaten[:]
             state.data._eaten[agentIndex] = True
         else:
             if not state.data._win:
@@ -523,6 +607,12 @@ def readCommand( argv ):
                       help='Turns on exception handling and timeouts during games', default=False)
     parser.add_option('--timeout', dest='timeout', type='int',
                       help=default('Maximum length of time an agent can spend computing in a single game'), default=30)
+    parser.add_option('--workers', dest='workers', type='int',
+                      help=default('Number of processes to spread games over; each game gets its own seed, and 1 plays the same seeded games serially'), default=0)
+    parser.add_option('--telemetry', dest='telemetry', default=None,
+                      help='Append a JSON Lines record of every move and game to this file (see telemetry.py)')
+    parser.add_option('--searchStats', action='store_true', dest='searchStats',
+                      help='Print how much Pacman searched per move (see multiAgents.SearchCounters)', default=False)
 
     options, otherjunk = parser.parse_args(argv)
     if len(otherjunk) != 0:
@@ -570,6 +660,14 @@ def readCommand( argv ):
     args['record'] = options.record
     args['catchExceptions'] = options.catchExceptions
     args['timeout'] = options.timeout
+    args['searchStats'] = options.searchStats
+    if options.telemetry:
+        import telemetry
+        args['telemetry'] = telemetry.TelemetrySink( options.telemetry )
+    if options.workers > 0:
+        if not options.quietGraphics:
+            raise Exception('--workers requires quiet graphics (-q)')
+        args['workers'] = options.workers
 
     # Special case: recorded games don't use the runGames method or args structure
     if options.gameToReplay != None:
@@ -624,13 +722,76 @@ def replayGame( layout, actions, display ):
 
     display.finish()
 
-def runGames( layout, pacman, ghosts, display, numGames, record, numTraining = 0, catchExceptions=False, timeout=30 ):
+def runSeededGame( payload ):
+    """
+    Plays one game after seeding the random module with the game's own seed.
+    runGames sends these to worker processes, so the finished Game comes
+    back together with everything printed while it was played.
+    """
+    layout, pacman, ghosts, display, seed, catchExceptions, timeout, telemetry = payload
+    import io
+    random.seed( seed )
+    rules = ClassicGameRules( timeout, telemetry )
+    output = io.StringIO()
+    oldStdout = sys.stdout
+    sys.stdout = output
+    try:
+        game = rules.newGame( layout, pacman, ghosts, display, False, catchExceptions )
+        game.run()
+    finally:
+        sys.stdout = oldStdout
+    return game, output.getvalue()
+
+def runParallelGames( layout, pacman, ghosts, display, numGames, catchExceptions, timeout, workers, telemetry=None ):
+    """
+    Plays numGames games over a pool of worker processes.  Game i is seeded
+    with a seed derived from the current random state and i, and the games
+    are merged back in order, so the results and output do not depend on
+    the number of workers; workers=1 plays the same games in this process.
+
+    Every game starts from its own copy of the agents, so an agent does not
+    carry anything (e.g. a transposition table) from one game to the next.
+    """
+    import pickle
+    masterSeed = random.getrandbits( 64 )
+    payloads = [( layout, pacman, ghosts, display, '%d-%d' % ( masterSeed, i ), catchExceptions, timeout, telemetry )
+                for i in range( numGames )]
+    if workers == 1:
+        results = (runSeededGame( pickle.loads( pickle.dumps( payload ) ) ) for payload in payloads)
+        return [printGameOutput( result ) for result in results]
+    import multiprocessing
+    with multiprocessing.Pool( workers ) as pool:
+        return [printGameOutput( result ) for result in pool.imap( runSeededGame, payloads )]
+
+def printGameOutput( result ):
+    game, output = result
+    sys.stdout.write( output )
+    return game
+
+def recordGame( layout, game, i ):
+    import time, pickle
+    fname = ('recorded-game-%d' % (i + 1)) +  '-'.join([str(t) for t in time.localtime()[1:6]])
+    f = open(fname, 'wb')
+    components = {'layout': layout, 'actions': game.moveHistory}
+    pickle.dump(components, f)
+    f.close()
+
+def runGames( layout, pacman, ghosts, display, numGames, record, numTraining = 0, catchExceptions=False, timeout=30, workers=0,
+              telemetry=None, searchStats=False ):
     import __main__
     __main__.__dict__['_display'] = display
 
-    rules = ClassicGameRules(timeout)
+    rules = ClassicGameRules(timeout, telemetry)
     games = []
 
+    # Training games update the agent as they go, so they are played serially
+    if workers > 0 and numTraining == 0:
+        games = runParallelGames( layout, pacman, ghosts, display, numGames, catchExceptions, timeout, workers, telemetry )
+        if record:
+            for i, game in enumerate( games ):
+                recordGame( layout, game, i )
+        numGames = 0
+
     for i in range( numGames ):
         beQuiet = i < numTraining
         if beQuiet:
@@ -646,14 +807,12 @@ def runGames( layout, pacman, ghosts, display, numGames, record, numTraining = 0
         if not beQuiet: games.append(game)
 
         if record:
-            import time, pickle
-            fname = ('recorded-game-%d' % (i + 1)) +  '-'.join([str(t) for t in time.localtime()[1:6]])
-            f = open(fname, 'wb')
-            components = {'layout': layout, 'actions': game.moveHistory}
-            pickle.dump(components, f)
-            f.close()
-
-    if (numGames-numTraining) > 0:
+            recordGame( layout, game, i )
+
+    if telemetry is not None:
+        telemetry.close()
+
+    if len(games) > 0:
         scores = [game.state.getScore() for game in games]
         wins = [game.state.isWin() for game in games]
         winRate = wins.count(True)/ float(len(wins))
@@ -661,6 +820,16 @@ def runGames( layout, pacman, ghosts, display, numGames, record, numTraining = 0
         print(('Scores:       ', ', '.join([str(score) for score in scores])))
         print(('Win Rate:      %d/%d (%.2f)' % (wins.count(True), len(wins), winRate)))
         print(('Record:       ', ', '.join([ ['Loss', 'Win'][int(w)] for w in wins])))
+        # Pacman's search counters (see multiAgents.SearchCounters), summed over the games
+        searchCounters = [game.searchCounters[0] for game in games if game.searchCounters[0] is not None]
+        if searchStats and len(searchCounters) > 0:
+            total = searchCounters[0].__class__()
+            for counters in searchCounters:
+                total.add(counters)
+            moves = float(max(1, total.moves))
+            print('Search:        %.0f nodes/move, %.0f evaluations/move, %d cut-offs, %d TT hits, branching factor %.2f' %
+                  (total.getNodes() / moves, total.evaluations / moves, total.cutoffs, total.ttHits,
+                   total.getEffectiveBranchingFactor()))
 
     return games
 
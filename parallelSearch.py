@@ -0,0 +1,165 @@
+# parallelSearch.py
+# -----------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Runs parts of a search agent's game tree in a pool of worker processes.
+
+A SearchPool starts its workers with a copy of the agent and the layout of
+the current game, so a task only has to ship a (layout-free) GameState, the
+name of the agent method to call on it and that method's arguments.  The
+workers also share an alpha bound that root-split alpha-beta raises as root
+moves finish, and a cancellation epoch: bumping it (SearchPool.cancel) makes
+every task submitted before stop at its next checkDeadline.
+"""
+import copy
+import multiprocessing
+import time
+
+# The agent, layout, shared alpha and epoch of this worker process (see
+# initWorker), and the epoch of the task it is running
+_WORKER = {}
+
+class SearchCancelled(Exception):
+    "Raised inside a worker's search when its task has been cancelled."
+    pass
+
+def packState(gameState, layout):
+    """
+    Returns a copy of gameState that does not carry the layout along if it
+    is the workers' layout, nor the undo records of a state searched in
+    place (GameState.doMove).
+    """
+    if gameState.data.layout is not layout and not gameState.undoStack:
+        return gameState
+    state = copy.copy(gameState)
+    state.undoStack = None
+    state.data = copy.copy(gameState.data)
+    if state.data.layout is layout:
+        state.data.layout = None
+    return state
+
+def unpackState(gameState):
+    "Reattaches this worker's layout to a state made by packState."
+    if gameState.data.layout is None:
+        gameState.data.layout = _WORKER['layout']
+    return gameState
+
+def initWorker(agent, layout, alpha, epoch):
+    _WORKER['agent'] = agent
+    _WORKER['layout'] = layout
+    _WORKER['alpha'] = alpha
+    _WORKER['epoch'] = epoch
+    _WORKER['taskEpoch'] = epoch.value
+
+def isCancelled():
+    "True in a worker whose current task has been cancelled by the parent."
+    epoch = _WORKER.get('epoch')
+    return epoch is not None and epoch.value != _WORKER['taskEpoch']
+
+def getSharedAlpha():
+    "The best root value found by any worker during this search."
+    alpha = _WORKER.get('alpha')
+    return alpha.value if alpha is not None else float('-inf')
+
+def raiseSharedAlpha(value):
+    alpha = _WORKER.get('alpha')
+    if alpha is None: return
+    with alpha.get_lock():
+        if value > alpha.value:
+            alpha.value = value
+
+def runTask(task):
+    """
+    Calls agent.<methodName>(gameState, *args) in a worker, with the depth
+    and time budget of the search in the parent.  Returns (result,
+    depthCutoff, timedOut, counters), where counters are the task's
+    SearchCounters, for the parent to add to its own.
+    """
+    from multiAgents import SearchTimeout
+    methodName, gameState, args, depth, timeLeft, epoch = task
+    _WORKER['taskEpoch'] = epoch
+    agent = _WORKER['agent']
+    agent.depth = depth
+    agent.deadline = time.perf_counter() + timeLeft if timeLeft is not None else None
+    agent.depthCutoff = False
+    if agent.transpositionTable is not None:
+        agent.transpositionTable.newSearch()
+    agent.resetMoveCounters()
+    if isCancelled():
+        return None, False, False, None
+    try:
+        return getattr(agent, methodName)(unpackState(gameState), *args), agent.depthCutoff, False, \
+            agent.getMoveCounters()
+    except SearchCancelled:
+        return None, agent.depthCutoff, False, agent.getMoveCounters()
+    except SearchTimeout:
+        return None, agent.depthCutoff, True, agent.getMoveCounters()
+    finally:
+        agent.deadline = None
+
+def runIndexedTask(indexedTask):
+    index, task = indexedTask
+    return index, runTask(task)
+
+def canStartPool():
+    "Daemonic processes (e.g. the games of pacman.py --workers) cannot start a pool."
+    return not multiprocessing.current_process().daemon
+
+class SearchPool:
+    """
+    A pool of worker processes searching for one agent in one game.  The
+    agent must be picklable without its pool (see
+    MultiAgentSearchAgent.__getstate__).
+    """
+    def __init__(self, agent, layout, workers):
+        self.layout = layout
+        self.alpha = multiprocessing.Value('d', float('-inf'))
+        # Read by the workers at every node, so it has no lock
+        self.epoch = multiprocessing.RawValue('i', 0)
+        self.pool = multiprocessing.Pool(workers, initWorker, (agent, layout, self.alpha, self.epoch))
+
+    def resetAlpha(self):
+        with self.alpha.get_lock():
+            self.alpha.value = float('-inf')
+
+    def makeTasks(self, methodName, gameState, argsList, depth, deadline):
+        packed = packState(gameState, self.layout)
+        timeLeft = deadline - time.perf_counter() if deadline is not None else None
+        return [(methodName, packed, args, depth, timeLeft, self.epoch.value) for args in argsList]
+
+    def map(self, methodName, gameState, argsList, depth, deadline=None):
+        """
+        Calls methodName(gameState, *args) in the workers for every args in
+        argsList.  Returns the list of (result, depthCutoff, timedOut,
+        counters).
+        """
+        tasks = self.makeTasks(methodName, gameState, argsList, depth, deadline)
+        return self.pool.map(runTask, tasks, chunksize=1)
+
+    def imapUnordered(self, methodName, gameState, argsList, depth, deadline=None):
+        """
+        Like map, but yields (index into argsList, result) as the tasks
+        finish.  A cancelled task's result is (None, depthCutoff, False,
+        counters).
+        """
+        tasks = self.makeTasks(methodName, gameState, argsList, depth, deadline)
+        return self.pool.imap_unordered(runIndexedTask, enumerate(tasks))
+
+    def cancel(self):
+        "Stops every task submitted so far."
+        self.epoch.value += 1
+
+    def close(self):
+        self.pool.terminate()
+        self.pool.join()
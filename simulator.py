@@ -0,0 +1,358 @@
+# simulator.py
+# ------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+A minimal mutable Pacman simulator for playouts.
+
+A RolloutSimulator copies the dynamic part of a GameState (agent positions,
+directions and scared timers, the food and capsules as bitboards, the
+score) into plain integers and lists, and plays moves on them in place with
+doMove / undoMove.  It reproduces the movement and scoring of PacmanRules
+and GhostRules in pacman.py, but skips the legality re-checks, the
+GameState.explored bookkeeping, the hashing and the copies that
+GameState.generateSuccessor pays for.  Legal moves come from the layout's
+action tables (Layout.getActionTables), the ones PacmanRules and GhostRules
+use, and moves are made with its neighbour table (Layout.getNeighborTable).
+
+Positions are kept on a grid of half steps (doubled coordinates), so scared
+ghosts, which move at half speed, stay on integers.  Actions are indices
+into ACTIONS.
+
+Running this file plays random games with both the simulator and the real
+rules, checks that they agree after every move, and reports how many moves
+per second the simulator plays:
+
+  python simulator.py -l smallClassic,mediumClassic -n 20
+"""
+from game import Directions, Configuration, BitGrid
+from pacman import SCARED_TIME, TIME_PENALTY
+import random
+import time
+
+ACTIONS = (Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST, Directions.STOP)
+NORTH, SOUTH, EAST, WEST, STOP = range(5)
+REVERSE = (SOUTH, NORTH, WEST, EAST, STOP)
+ACTION_INDEX = dict((action, index) for index, action in enumerate(ACTIONS))
+DELTAS = ((0, 1), (0, -1), (1, 0), (-1, 0), (0, 0))
+
+_MOVE_TABLES_CACHE = {}
+
+class MoveTables:
+    """
+    Layout.getActionTables indexed by cell instead of position, with action
+    indices instead of Directions: Pacman's legal actions
+    (pacmanActions[cell]) and a ghost's for each direction it arrived in
+    (ghostActions[5 * cell + direction]).
+    """
+    def __init__(self, layout):
+        self.height = layout.height
+        self.neighbors = layout.getNeighborTable()
+        pacmanByPos, ghostByPos = layout.getActionTables()
+        self.pacmanActions = []
+        self.ghostActions = []
+        for cell in range(layout.width * layout.height):
+            pos = (cell // self.height, cell % self.height)
+            if pos not in pacmanByPos:
+                self.pacmanActions.append(())
+                self.ghostActions.extend([()] * 5)
+                continue
+            self.pacmanActions.append(tuple(ACTION_INDEX[a] for a in pacmanByPos[pos]))
+            for direction in ACTIONS:
+                self.ghostActions.append(tuple(ACTION_INDEX[a] for a in ghostByPos[pos][direction]))
+
+def getMoveTables(layout):
+    key = "\n".join(layout.layoutText)
+    tables = _MOVE_TABLES_CACHE.get(key)
+    if tables is None:
+        tables = _MOVE_TABLES_CACHE[key] = MoveTables(layout)
+    return tables
+
+class RolloutSimulator:
+    """
+    The dynamic state of a game, played forward with doMove and back with
+    undoMove.  Moves are not checked for legality: pick them from
+    getLegalActions, and none once isWin() or isLose().
+    """
+    def __init__(self, gameState):
+        data = gameState.data
+        self.origin = gameState
+        tables = getMoveTables(data.layout)
+        self.height = tables.height
+        self.neighbors = tables.neighbors
+        self.pacmanActions = tables.pacmanActions
+        self.ghostActions = tables.ghostActions
+
+        pacman = data.agentStates[0].configuration
+        x, y = pacman.pos
+        self.pacmanCell = int(x) * self.height + int(y)
+        self.pacmanX, self.pacmanY = 2 * int(x), 2 * int(y)
+        self.pacmanDir = ACTION_INDEX[pacman.direction]
+        # Ghost lists are indexed by agent index; entry 0 is unused
+        self.numAgents = len(data.agentStates)
+        self.ghostX, self.ghostY, self.ghostDir, self.scared, self.ghostStart = [0], [0], [0], [0], [None]
+        for ghost in data.agentStates[1:]:
+            x, y = ghost.configuration.pos
+            self.ghostX.append(int(round(2 * x)))
+            self.ghostY.append(int(round(2 * y)))
+            self.ghostDir.append(ACTION_INDEX[ghost.configuration.direction])
+            self.scared.append(ghost.scaredTimer)
+            x, y = ghost.start.pos
+            self.ghostStart.append((int(round(2 * x)), int(round(2 * y)), ACTION_INDEX[ghost.start.direction]))
+        self.food = data.food.bits
+        self.capsules = 0
+        for x, y in data.capsules:
+            self.capsules |= 1 << (x * self.height + y)
+        self.score = data.score
+        self.win = data._win
+        self.lose = data._lose
+        self.history = []
+
+    def isWin(self):
+        return self.win
+
+    def isLose(self):
+        return self.lose
+
+    def getScore(self):
+        return self.score
+
+    def getLegalActions(self, agentIndex):
+        "The legal actions of an agent, as a tuple of indices into ACTIONS."
+        if agentIndex == 0:
+            return self.pacmanActions[self.pacmanCell]
+        x, y = self.ghostX[agentIndex], self.ghostY[agentIndex]
+        if (x | y) & 1:
+            # In between grid points, ghosts must continue straight
+            return (self.ghostDir[agentIndex],)
+        return self.ghostActions[5 * ((x >> 1) * self.height + (y >> 1)) + self.ghostDir[agentIndex]]
+
+    def doMove(self, agentIndex, action):
+        if agentIndex == 0:
+            self.movePacman(action)
+        else:
+            self.moveGhost(agentIndex, action)
+
+    def movePacman(self, action):
+        cell = self.pacmanCell
+        record = [0, cell, self.pacmanDir, self.score, self.food, self.capsules, None, self.win, self.lose, None]
+        if action != STOP:
+            cell = self.neighbors[4 * cell + action]
+            self.pacmanDir = action
+            self.pacmanCell = cell
+            self.pacmanX, self.pacmanY = 2 * (cell // self.height), 2 * (cell % self.height)
+        bit = 1 << cell
+        if self.food & bit:
+            self.score += 10
+            self.food ^= bit
+            if not self.food and not self.lose:
+                self.score += 500
+                self.win = True
+        if self.capsules & bit:
+            self.capsules ^= bit
+            record[6] = self.scared
+            self.scared = [0] + [SCARED_TIME] * (self.numAgents - 1)
+        self.score -= TIME_PENALTY
+        # Anyone can kill Pacman after he moves
+        px, py = self.pacmanX, self.pacmanY
+        for index in range(1, self.numAgents):
+            if abs(self.ghostX[index] - px) + abs(self.ghostY[index] - py) <= 1:
+                if self.scared[index] > 0:
+                    if record[9] is None: record[9] = []
+                    record[9].append((index, self.ghostX[index], self.ghostY[index], self.ghostDir[index], self.scared[index]))
+                self.collide(index)
+        self.history.append(record)
+
+    def moveGhost(self, index, action):
+        x, y, timer = self.ghostX[index], self.ghostY[index], self.scared[index]
+        self.history.append((index, x, y, self.ghostDir[index], timer, self.score, self.lose))
+        dx, dy = DELTAS[action]
+        if timer > 0:
+            x, y = x + dx, y + dy
+            if timer == 1:
+                # Back on the grid (nearestPoint) when the ghost stops being scared
+                x, y = x + (x & 1), y + (y & 1)
+            self.scared[index] = timer - 1
+        else:
+            x, y = x + 2 * dx, y + 2 * dy
+        self.ghostX[index], self.ghostY[index] = x, y
+        if action != STOP:
+            self.ghostDir[index] = action
+        if abs(x - self.pacmanX) + abs(y - self.pacmanY) <= 1:
+            self.collide(index)
+
+    def collide(self, index):
+        if self.scared[index] > 0:
+            self.score += 200
+            self.ghostX[index], self.ghostY[index], self.ghostDir[index] = self.ghostStart[index]
+            self.scared[index] = 0
+        elif not self.win:
+            self.score -= 500
+            self.lose = True
+
+    def undoMove(self):
+        record = self.history.pop()
+        index = record[0]
+        if index == 0:
+            _, cell, self.pacmanDir, self.score, self.food, self.capsules, scared, self.win, self.lose, eaten = record
+            self.pacmanCell = cell
+            self.pacmanX, self.pacmanY = 2 * (cell // self.height), 2 * (cell % self.height)
+            if eaten is not None:
+                for ghost, x, y, direction, timer in reversed(eaten):
+                    self.ghostX[ghost], self.ghostY[ghost], self.ghostDir[ghost], self.scared[ghost] = x, y, direction, timer
+            if scared is not None:
+                self.scared = scared
+        else:
+            _, self.ghostX[index], self.ghostY[index], self.ghostDir[index], self.scared[index], self.score, self.lose = record
+
+    def playout(self, agentIndex, plies, rng=random):
+        """
+        Plays up to plies random moves drawn from rng, starting with
+        agentIndex, and returns how many were made (undo them with undoMove).
+        Pacman neither stops nor turns back unless he has to.
+        """
+        numAgents = self.numAgents
+        choice = rng.choice
+        for ply in range(plies):
+            if self.win or self.lose:
+                return ply
+            actions = self.getLegalActions(agentIndex)
+            if agentIndex == 0:
+                forward = [a for a in actions if a != STOP and a != REVERSE[self.pacmanDir]]
+                if forward: actions = forward
+            self.doMove(agentIndex, choice(actions))
+            agentIndex = (agentIndex + 1) % numAgents
+        return plies
+
+    def toGameState(self):
+        """
+        Returns a GameState of the current position, built from the state the
+        simulator was created from (e.g. to score it with an evaluation
+        function).
+        """
+        origin = self.origin
+        state = origin.__class__(origin)
+        data = state.data
+        height = self.height
+        data.food = BitGrid(data.food.width, data.food.height, self.food)
+        data.capsules = tuple(c for c in data.capsules if self.capsules >> (c[0] * height + c[1]) & 1)
+        cell = self.pacmanCell
+        pacman = data.copyAgentState(0)
+        pacman.configuration = Configuration((cell // height, cell % height), ACTIONS[self.pacmanDir])
+        for index in range(1, self.numAgents):
+            ghost = data.copyAgentState(index)
+            ghost.configuration = Configuration((self.ghostX[index] / 2.0, self.ghostY[index] / 2.0), ACTIONS[self.ghostDir[index]])
+            ghost.scaredTimer = self.scared[index]
+        data.score = self.score
+        data._win = self.win
+        data._lose = self.lose
+        data._zobrist = None
+        return state
+
+def wallLegalActions(state, agentIndex):
+    """
+    The legal actions of agentIndex in state, worked out from the walls with
+    Actions.getPossibleActions and GhostRules' rule for ghosts (no STOP, no
+    turning back unless at a dead end) rather than read from the layout's
+    action tables, which both GameState and RolloutSimulator use.
+    """
+    from game import Actions
+    conf = state.data.agentStates[agentIndex].configuration
+    possible = Actions.getPossibleActions(conf, state.data.layout.walls)
+    if agentIndex == 0:
+        return possible
+    possible = [a for a in possible if a != Directions.STOP]
+    reverse = Actions.reverseDirection(conf.direction)
+    if reverse in possible and len(possible) > 1:
+        possible.remove(reverse)
+    return possible
+
+def crossCheck(layout, numGhosts, numGames, maxMoves, rng=random):
+    """
+    Plays numGames random games (drawn from rng) on layout with both
+    GameState and a RolloutSimulator, checks the legal actions of both
+    against wallLegalActions and compares the states after every move and
+    after undoing every move again, and returns the number of mismatches.
+    """
+    from pacman import GameState
+    mismatches = 0
+    for game in range(numGames):
+        state = GameState()
+        state.initialize(layout, numGhosts)
+        simulator = RolloutSimulator(state)
+        states = [state]
+        agentIndex = 0
+        for move in range(maxMoves):
+            if state.isWin() or state.isLose(): break
+            legal = state.getLegalActions(agentIndex)
+            expected = wallLegalActions(state, agentIndex)
+            if legal != expected or [ACTIONS[a] for a in simulator.getLegalActions(agentIndex)] != expected:
+                mismatches += 1
+                print('Legal actions differ after %d moves of game %d' % (move, game))
+                break
+            if agentIndex == 0 and len(legal) > 1:
+                legal = [a for a in legal if a != Directions.STOP]
+            action = rng.choice(legal)
+            state = state.generateSuccessor(agentIndex, action)
+            simulator.doMove(agentIndex, ACTION_INDEX[action])
+            if simulator.toGameState() != state or simulator.isWin() != state.isWin() or simulator.isLose() != state.isLose():
+                mismatches += 1
+                print('States differ after %d moves of game %d' % (move + 1, game))
+                break
+            states.append(state)
+            agentIndex = (agentIndex + 1) % state.getNumAgents()
+        while simulator.history:
+            states.pop()
+            simulator.undoMove()
+            if simulator.toGameState() != states[-1]:
+                mismatches += 1
+                print('Undo differs %d moves into game %d' % (len(states) - 1, game))
+                break
+    return mismatches
+
+def measureSpeed(layout, numGhosts, seconds=1.0, plies=30, rng=random):
+    "Simulator moves per second in random playouts from the start of a game."
+    from pacman import GameState
+    state = GameState()
+    state.initialize(layout, numGhosts)
+    simulator = RolloutSimulator(state)
+    moves = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        played = simulator.playout(0, plies, rng)
+        moves += played
+        for move in range(played):
+            simulator.undoMove()
+    return moves / (time.perf_counter() - start)
+
+if __name__ == '__main__':
+    import layout
+    import sys
+    from optparse import OptionParser
+    parser = OptionParser(__doc__)
+    parser.add_option('-l', '--layouts', dest='layouts', default='smallClassic,mediumClassic,originalClassic')
+    parser.add_option('-k', '--numghosts', type='int', dest='numGhosts', default=4)
+    parser.add_option('-n', '--numGames', type='int', dest='numGames', default=20)
+    parser.add_option('-m', '--maxMoves', type='int', dest='maxMoves', default=2000)
+    parser.add_option('--seed', dest='seed', default='0')
+    options, otherjunk = parser.parse_args(sys.argv[1:])
+    rng = random.Random(options.seed)
+    failed = False
+    for layoutName in options.layouts.split(','):
+        lay = layout.getLayout(layoutName)
+        numGhosts = min(options.numGhosts, lay.getNumGhosts())
+        mismatches = crossCheck(lay, numGhosts, options.numGames, options.maxMoves, rng)
+        failed = failed or mismatches > 0
+        print('%-16s %d mismatches in %d games, %.0f moves/s' %
+              (layoutName, mismatches, options.numGames, measureSpeed(lay, numGhosts, rng=rng)))
+    sys.exit(1 if failed else 0)
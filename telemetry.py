@@ -0,0 +1,107 @@
+# telemetry.py
+# ------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Per-move and per-game telemetry from Game.run, as JSON Lines.
+
+A TelemetrySink given to a Game (pacman.py --telemetry <file>) gets one
+record per move:
+
+  {"type": "move", "game": "3f2a9c...", "turn": 0, "agent": 0, "action": "West",
+   "latency": 0.0123, "nodes": 512, "hash": -7203..., "scoreDelta": -1}
+
+latency is the seconds the agent took to observe and decide, nodes the
+nodes its search generated for the move (from the getMoveCounters() of a
+multiAgents.MultiAgentSearchAgent, null for agents without search
+counters) and hash the hash of the state after the move.  game is a random
+UUID (uuid4), so the records of games played by several processes or runs
+into one file stay apart.  After the last move comes one record for the
+whole game, with the asDict() of each search agent's getGameCounters(),
+the only source of search statistics:
+
+  {"type": "game", "game": "3f2a9c...", "agents": ["AlphaBetaAgent", ...],
+   "moves": 320, "score": 1240.0, "win": true, "crashed": false,
+   "timedOut": false, "agentTimes": [...], "timeWarnings": [...],
+   "search": [{"moves": 160, "nodes": 81920, "nodesPerPly": [...], ...},
+   null, ...], "duration": 4.2}
+
+Moves are kept as tuples and only turned into JSON when the buffer is
+written: every bufferSize records and at the end of each game.  Each batch
+goes to the file in a single append, so games played by several processes
+(pacman.py --workers) can share one file.
+"""
+import json
+import os
+import uuid
+
+class TelemetrySink:
+    "Buffers the records of the games given it and appends them to path."
+    def __init__(self, path, bufferSize=1000):
+        self.path = path
+        self.bufferSize = bufferSize
+        self.buffer = []
+
+    def __getstate__(self):
+        # Workers get an empty buffer of their own
+        state = self.__dict__.copy()
+        state['buffer'] = []
+        return state
+
+    def startGame(self):
+        "Returns the id of a new game's records, unique across processes and runs."
+        return uuid.uuid4().hex
+
+    def recordMove(self, gameId, turn, agentIndex, action, latency, nodes, state, scoreDelta):
+        self.buffer.append(('move', gameId, turn, agentIndex, action, latency, nodes, hash(state), scoreDelta))
+        if len(self.buffer) >= self.bufferSize:
+            self.flush()
+
+    def recordGame(self, gameId, game, duration):
+        state = game.state
+        self.buffer.append({
+            'type': 'game',
+            'game': gameId,
+            'agents': [agent.__class__.__name__ if agent else None for agent in game.agents],
+            'moves': len(game.moveHistory),
+            'score': state.getScore(),
+            'win': state.isWin(),
+            'crashed': game.agentCrashed,
+            'timedOut': game.agentTimeout,
+            'agentTimes': game.totalAgentTimes,
+            'timeWarnings': game.totalAgentTimeWarnings,
+            'search': [counters.asDict() if counters is not None else None for counters in game.searchCounters],
+            'duration': duration,
+        })
+        self.flush()
+
+    def toJson(self, record):
+        if isinstance(record, dict):
+            return json.dumps(record)
+        kind, gameId, turn, agentIndex, action, latency, nodes, stateHash, scoreDelta = record
+        return json.dumps({'type': kind, 'game': gameId, 'turn': turn, 'agent': agentIndex, 'action': action,
+                           'latency': latency, 'nodes': nodes, 'hash': stateHash, 'scoreDelta': scoreDelta})
+
+    def flush(self):
+        if not self.buffer: return
+        data = ''.join([self.toJson(record) + '\n' for record in self.buffer]).encode()
+        self.buffer = []
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            while data:
+                data = data[os.write(fd, data):]
+        finally:
+            os.close(fd)
+
+    def close(self):
+        self.flush()
@@ -0,0 +1,325 @@
+# test_multiAgents.py
+# -------------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Checks of the search agents' options that the autograder's test cases do
+not cover.  Run with python -m unittest test_multiAgents (or pytest).
+"""
+import os
+import random
+import unittest
+
+import ghostAgents
+import layout
+from game import Actions, Configuration, Directions
+import multiAgents
+import simulator
+from pacman import GameState
+
+LAYOUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'layouts')
+
+def getLayout(name):
+    return layout.tryToLoad(os.path.join(LAYOUT_DIR, name + '.lay'))
+
+def playStates(lay, numMoves, seed=1):
+    "The states Pacman moves from in a game of random moves against RandomGhosts."
+    random.seed(seed)
+    state = GameState()
+    state.initialize(lay, lay.getNumGhosts())
+    states = []
+    while len(states) < numMoves and not (state.isWin() or state.isLose()):
+        states.append(state)
+        state = state.generateSuccessor(0, random.choice(state.getLegalActions(0)))
+        for ghost in range(1, state.getNumAgents()):
+            if state.isWin() or state.isLose(): break
+            state = state.generateSuccessor(ghost, ghostAgents.RandomGhost(ghost).getAction(state))
+    return states
+
+class TickingClock:
+    """
+    Stands in for the time module in multiAgents: every perf_counter call
+    advances the clock by tick, so a move's time budget becomes a budget of
+    checkDeadline calls and iterative deepening is deterministic.
+    """
+    def __init__(self, tick):
+        self.now = 0.0
+        self.tick = tick
+
+    def perf_counter(self):
+        self.now += self.tick
+        return self.now
+
+class IterativeDeepeningTest(unittest.TestCase):
+
+    def setUp(self):
+        self.time = multiAgents.time
+        multiAgents.time = TickingClock(1e-5)
+
+    def tearDown(self):
+        multiAgents.time = self.time
+
+    def completedDepths(self, agent, states):
+        agent.registerInitialState(states[0])
+        depths = []
+        for state in states:
+            agent.getAction(state)
+            depths.append(agent.completedDepth)
+        return depths
+
+    def checkTableDoesNotStopEarly(self, agentName):
+        states = playStates(getLayout('smallClassic'), 6)
+        agentType = getattr(multiAgents, agentName)
+        withoutTable = self.completedDepths(agentType(moveTime='0.03'), states)
+        withTable = self.completedDepths(agentType(moveTime='0.03', ttSize='100000'), states)
+        for depth, tableDepth in zip(withoutTable, withTable):
+            self.assertGreaterEqual(tableDepth, depth, (withoutTable, withTable))
+
+    def testAlphaBetaTable(self):
+        self.checkTableDoesNotStopEarly('AlphaBetaAgent')
+
+    def testExpectimaxTable(self):
+        self.checkTableDoesNotStopEarly('ExpectimaxAgent')
+
+    def testBranchingFactorOfLastIteration(self):
+        # Expectimax searches every node whatever the move order, so the last
+        # completed iteration is the search of a fixed-depth agent
+        for state in playStates(getLayout('smallClassic'), 3):
+            agent = multiAgents.ExpectimaxAgent(moveTime='0.03')
+            agent.registerInitialState(state)
+            agent.getAction(state)
+            fixed = multiAgents.ExpectimaxAgent(depth=str(agent.completedDepth))
+            fixed.registerInitialState(state)
+            fixed.getAction(state)
+            self.assertGreater(agent.completedDepth, 1)
+            self.assertAlmostEqual(agent.getMoveCounters().getEffectiveBranchingFactor(),
+                                   fixed.getMoveCounters().getEffectiveBranchingFactor())
+
+# A capsule between Pacman and a ghost, so random games eat it, scare the
+# ghost and collide with it both scared and not
+CAPSULE_LAYOUT = ['%%%%%%%', '%P.o.G%', '%.%%%.%', '%.....%', '%%%%%%%']
+
+def randomGames(lay, numGames, maxMoves=200):
+    "Yields (state, successor) for every move of numGames games of random moves by all agents."
+    for seed in range(numGames):
+        rng = random.Random(seed)
+        state = GameState()
+        state.initialize(lay, lay.getNumGhosts())
+        agentIndex = 0
+        for move in range(maxMoves):
+            if state.isWin() or state.isLose(): break
+            successor = state.generateSuccessor(agentIndex, rng.choice(state.getLegalActions(agentIndex)))
+            yield state, successor
+            state = successor
+            agentIndex = (agentIndex + 1) % state.getNumAgents()
+
+class ZobristHashTest(unittest.TestCase):
+    """
+    The hash the rules keep up to date move by move must equal the one
+    computed from scratch, and equal states must hash equally.
+    """
+    def testIncrementalMatchesRecomputation(self):
+        events = set()
+        for lay in (layout.Layout(CAPSULE_LAYOUT), getLayout('smallClassic')):
+            for state, successor in randomGames(lay, 30):
+                data = successor.data
+                self.assertEqual(data._zobrist, data.computeZobrist())
+                if data._foodEaten is not None: events.add('food')
+                if data._capsuleEaten is not None: events.add('capsule')
+                if any(ghost.scaredTimer > 0 for ghost in successor.getGhostStates()): events.add('scared')
+                if any(data._eaten[1:]): events.add('ghost eaten')
+                if successor.isLose(): events.add('lose')
+        self.assertEqual(events, set(['food', 'capsule', 'scared', 'ghost eaten', 'lose']))
+
+    def testEqualStatesHashEqually(self):
+        lay = layout.Layout(CAPSULE_LAYOUT)
+        start = GameState()
+        start.initialize(lay, lay.getNumGhosts())
+        states = reachableStates(start, 0, 3, 3)
+        equalPairs = 0
+        for i, state in enumerate(states):
+            for other in states[i + 1:]:
+                if state == other:
+                    equalPairs += 1
+                    self.assertEqual(hash(state), hash(other))
+        # Pacman stopping before or after a move reaches one state two ways
+        self.assertGreater(equalPairs, 0)
+
+class DoMoveTest(unittest.TestCase):
+    """
+    GameState.doMove must reach the state generateSuccessor does, and
+    undoMove must restore everything a move changed.
+    """
+    def saved(self, state):
+        data = state.data
+        return (state.snapshot(), hash(state), data.score, data._win, data._lose, data.food, data.capsules,
+                [agentState.scaredTimer for agentState in data.agentStates])
+
+    def checkRestored(self, state, saved):
+        data = state.data
+        copy, stateHash, score, win, lose, food, capsules, scaredTimers = saved
+        self.assertEqual(state, copy)
+        self.assertEqual(hash(state), stateHash)
+        self.assertEqual(data._zobrist, data.computeZobrist())
+        self.assertEqual((data.score, data._win, data._lose), (score, win, lose))
+        self.assertIs(data.food, food)
+        self.assertIs(data.capsules, capsules)
+        self.assertEqual([agentState.scaredTimer for agentState in data.agentStates], scaredTimers)
+
+    def testUndoRestoresChains(self):
+        events = set()
+        for lay in (layout.Layout(CAPSULE_LAYOUT), getLayout('smallClassic')):
+            for seed in range(20):
+                rng = random.Random(seed)
+                state = GameState()
+                state.initialize(lay, lay.getNumGhosts())
+                history = []
+                agentIndex = 0
+                while len(history) < 200 and not (state.isWin() or state.isLose()):
+                    action = rng.choice(state.getLegalActions(agentIndex))
+                    successor = state.generateSuccessor(agentIndex, action)
+                    history.append(self.saved(state))
+                    state.doMove(agentIndex, action)
+                    self.assertEqual(state, successor)
+                    self.assertEqual(hash(state), hash(successor))
+                    if state.data._capsuleEaten is not None: events.add('capsule')
+                    if any(state.data._eaten[1:]): events.add('ghost eaten')
+                    agentIndex = (agentIndex + 1) % state.getNumAgents()
+                if state.isLose(): events.add('lose')
+                while history:
+                    state.undoMove()
+                    self.checkRestored(state, history.pop())
+        self.assertEqual(events, set(['capsule', 'ghost eaten', 'lose']))
+
+class SeedTest(unittest.TestCase):
+    """
+    The agents that sample draw from their own generator, so a seeded agent
+    repeats its moves and leaves the random module (the ghosts') alone.
+    """
+    def setUp(self):
+        self.time = multiAgents.time
+
+    def tearDown(self):
+        multiAgents.time = self.time
+
+    def playSeeded(self, agent, states):
+        multiAgents.time = TickingClock(1e-4)
+        random.seed(0)
+        agent.registerInitialState(states[0])
+        actions = [agent.getAction(state) for state in states]
+        return actions, random.random()
+
+    def checkSeeded(self, agentName, **args):
+        states = playStates(getLayout('smallClassic'), 4)
+        agentType = getattr(multiAgents, agentName)
+        first = self.playSeeded(agentType(seed='3', **args), states)
+        second = self.playSeeded(agentType(seed='3', **args), states)
+        self.assertEqual(first, second)
+        random.seed(0)
+        self.assertEqual(first[1], random.random())
+
+    def testMonteCarlo(self):
+        self.checkSeeded('MonteCarloAgent', moveTime='0.05')
+
+    def testSparseSampling(self):
+        self.checkSeeded('ExpectimaxAgent', samples='4', ghostModel='DirectionalGhost')
+
+class ActionTablesTest(unittest.TestCase):
+    "Layout.getActionTables must agree with the walls at every cell and in every direction."
+
+    LAYOUTS = ['smallClassic', 'trappedClassic', 'originalClassic']
+    # Dead ends, a one-cell tunnel and a corridor two cells wide
+    TUNNELS = ['%%%%%%%%%', '%P  %  G%', '%% %%% %%', '%       %', '%%%% %%%%', '%%%%.%%%%', '%%%%%%%%%']
+
+    def checkTables(self, lay):
+        pacmanActions, ghostActions = lay.getActionTables()
+        for x in range(lay.width):
+            for y in range(lay.height):
+                if lay.walls[x][y]:
+                    self.assertNotIn((x, y), pacmanActions)
+                    continue
+                possible = Actions.getPossibleActions(Configuration((x, y), Directions.STOP), lay.walls)
+                self.assertEqual(list(pacmanActions[(x, y)]), possible, (x, y))
+                moves = [a for a in possible if a != Directions.STOP]
+                for direction in (Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST, Directions.STOP):
+                    reverse = Actions.reverseDirection(direction)
+                    expected = [a for a in moves if a != reverse] if reverse in moves and len(moves) > 1 else moves
+                    self.assertEqual(list(ghostActions[(x, y)][direction]), expected, (x, y, direction))
+
+    def testLayouts(self):
+        for name in self.LAYOUTS:
+            with self.subTest(layout=name):
+                self.checkTables(getLayout(name))
+
+    def testTunnels(self):
+        self.checkTables(layout.Layout(self.TUNNELS))
+
+class SimulatorTest(unittest.TestCase):
+    "RolloutSimulator must play by the rules of GameState (see simulator.crossCheck)."
+
+    def testCrossCheck(self):
+        for name in ('smallClassic', 'trappedClassic', 'capsuleClassic', 'originalClassic'):
+            lay = getLayout(name)
+            mismatches = simulator.crossCheck(lay, lay.getNumGhosts(), 5, 300, random.Random(name))
+            self.assertEqual(mismatches, 0, name)
+
+def reachableStates(state, agentIndex, pacmanMoves, ghostMoves):
+    "Every state reached from state, agentIndex to move, within the given numbers of moves."
+    states = [state]
+    if state.isWin() or state.isLose():
+        return states
+    if (pacmanMoves if agentIndex == 0 else ghostMoves) == 0:
+        return states
+    nextAgent = (agentIndex + 1) % state.getNumAgents()
+    if agentIndex == 0:
+        pacmanMoves -= 1
+    else:
+        ghostMoves -= 1
+    for action in state.getLegalActions(agentIndex):
+        states += reachableStates(state.generateSuccessor(agentIndex, action), nextAgent, pacmanMoves, ghostMoves)
+    return states
+
+class EvaluationBoundsTest(unittest.TestCase):
+    """
+    EVALUATION_BOUNDS must hold for every state within reach, or Star1 and
+    Star2 pruning can change ExpectimaxAgent's values.
+    """
+    LAYOUTS = [
+        # One pellet: winning early saves time penalties
+        ['%%%%%%', '%P. G%', '%%%%%%'],
+        ['%%%%%%%', '%P.o.G%', '%.%%%.%', '%.....%', '%%%%%%%'],
+    ]
+
+    def checkBounds(self, state, pacmanMoves):
+        ghostMoves = pacmanMoves * (state.getNumAgents() - 1)
+        states = reachableStates(state, 0, pacmanMoves, ghostMoves)
+        for evalFn, boundsFn in multiAgents.EVALUATION_BOUNDS.items():
+            lower, upper = boundsFn(state, pacmanMoves, ghostMoves)
+            values = [evalFn(reached) for reached in states]
+            self.assertLessEqual(lower, min(values), evalFn.__name__)
+            self.assertGreaterEqual(upper, max(values), evalFn.__name__)
+
+    def testSmallLayouts(self):
+        for text in self.LAYOUTS:
+            lay = layout.Layout(text)
+            state = GameState()
+            state.initialize(lay, lay.getNumGhosts())
+            for pacmanMoves in range(1, 4):
+                self.checkBounds(state, pacmanMoves)
+
+    def testGameStates(self):
+        for state in playStates(getLayout('smallClassic'), 20)[::4]:
+            self.checkBounds(state, 2)
+
+if __name__ == '__main__':
+    unittest.main()
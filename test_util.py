@@ -0,0 +1,82 @@
+# test_util.py
+# ------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Checks of util's timeouts (TimeoutFunction and the DeadlineService behind
+it).  Run with python -m unittest test_util (or pytest).
+"""
+import threading
+import time
+import unittest
+
+import util
+from util import Deadline, TimeoutFunction, TimeoutFunctionException
+
+def spin(seconds):
+    "A busy loop in Python code, which the watchdog's exception can interrupt."
+    end = time.monotonic() + seconds
+    count = 0
+    while time.monotonic() < end:
+        count += 1
+    return count
+
+class DeadlineTest(unittest.TestCase):
+
+    def testBusyLoopTimesOut(self):
+        start = time.monotonic()
+        self.assertRaises(TimeoutFunctionException, TimeoutFunction(spin, 0.05), 1.0)
+        if util._setAsyncExc is not None:
+            # Interrupted by the watchdog, not noticed when spin returned
+            self.assertLess(time.monotonic() - start, 0.5)
+
+    def testCancelledDeadlineNeverFires(self):
+        self.assertGreater(TimeoutFunction(spin, 0.1)(0.01), 0)
+        deadline = Deadline(0.05, threading.get_ident())
+        util.DEADLINES.start(deadline)
+        self.assertFalse(util.DEADLINES.finish(deadline))
+        # Past the expiry of both deadlines: nothing may be raised here
+        spin(0.2)
+        self.assertFalse(deadline.fired)
+        self.assertEqual(util.getTimeLeft(), float('inf'))
+
+    def testInnerDeadlineExpires(self):
+        def outer():
+            self.assertRaises(TimeoutFunctionException, TimeoutFunction(spin, 0.05), 1.0)
+            self.assertGreater(util.getTimeLeft(), 0)
+            return spin(0.05)
+        self.assertGreater(TimeoutFunction(outer, 5.0)(), 0)
+
+    def testOuterDeadlineExpires(self):
+        def outer():
+            return TimeoutFunction(spin, 5.0)(1.0)
+        self.assertRaises(TimeoutFunctionException, TimeoutFunction(outer, 0.05))
+        self.assertEqual(util.getTimeLeft(), float('inf'))
+
+    def testDeadlineOffTheMainThread(self):
+        outcome = []
+        def run():
+            try:
+                TimeoutFunction(spin, 0.05)(1.0)
+                outcome.append('returned')
+            except TimeoutFunctionException:
+                outcome.append('timed out')
+        thread = threading.Thread(target=run)
+        thread.start()
+        # The main thread spins through the other thread's deadline unharmed
+        spin(0.2)
+        thread.join()
+        self.assertEqual(outcome, ['timed out'])
+
+if __name__ == '__main__':
+    unittest.main()
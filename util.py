@@ -488,14 +488,15 @@ def nSample(distribution, values, n):
             cdf += distribution[distPos]
     return samples
 
-def sample(distribution, values = None):
+def sample(distribution, values = None, rng = random):
+    "rng is the random number generator to draw from (e.g. a random.Random)."
     if type(distribution) == Counter:
         items = sorted(distribution.items())
         distribution = [i[1] for i in items]
         values = [i[0] for i in items]
     if sum(distribution) != 1:
         distribution = normalize(distribution)
-    choice = random.random()
+    choice = rng.random()
     i, total= 0, distribution[0]
     while choice > total:
         i += 1
@@ -521,11 +522,11 @@ def flipCoin( p ):
     r = random.random()
     return r < p
 
-def chooseFromDistribution( distribution ):
-    "Takes either a counter or a list of (prob, key) pairs and samples"
+def chooseFromDistribution( distribution, rng = random ):
+    "Takes either a counter or a list of (prob, key) pairs and samples (from rng)"
     if type(distribution) == dict or type(distribution) == Counter:
-        return sample(distribution)
-    r = random.random()
+        return sample(distribution, rng=rng)
+    r = rng.random()
     base = 0.0
     for prob, element in distribution:
         base += prob
@@ -599,45 +600,175 @@ def pause():
 
 # code to handle timeouts
 #
-# FIXME
-# NOTE: TimeoutFuncton is NOT reentrant.  Later timeouts will silently
-# disable earlier timeouts.  Could be solved by maintaining a global list
-# of active time outs.  Currently, questions which have test cases calling
-# this have all student code so wrapped.
+# Timeouts are deadlines on the monotonic clock kept by a DeadlineService.
+# They nest (each thread has a stack of them), work off the main thread and
+# have sub-second precision.  Code running under a deadline can poll
+# getTimeLeft() and checkTimeout(); a watchdog thread enforces the deadlines
+# of code that doesn't.
 #
-import signal
+import threading
 import time
+
+try:
+    import ctypes
+    _setAsyncExc = ctypes.pythonapi.PyThreadState_SetAsyncExc
+except (ImportError, AttributeError):
+    _setAsyncExc = None
+
+def raiseInThread(threadId, exceptionType):
+    "Makes threadId raise exceptionType as soon as it runs Python code; None cancels."
+    exception = ctypes.py_object(exceptionType) if exceptionType is not None else None
+    _setAsyncExc(ctypes.c_ulong(threadId), exception)
+
 class TimeoutFunctionException(Exception):
     """Exception to raise on a timeout"""
     pass
 
+class Deadline:
+    """
+    One timeout: the monotonic time it expires at and the thread it runs in.
+    """
+    def __init__(self, seconds, threadId):
+        self.expiry = time.monotonic() + seconds
+        self.threadId = threadId
+        self.done = False
+        self.fired = False
+
+    def getTimeLeft(self):
+        return self.expiry - time.monotonic()
+
+    def isExpired(self):
+        return time.monotonic() >= self.expiry
+
+class DeadlineService:
+    """
+    Keeps the deadlines of every thread.  start(deadline) pushes a Deadline
+    on the calling thread's stack and finish(deadline) pops it again.
+
+    Once a deadline passes, a watchdog thread raises TimeoutFunctionException
+    in the thread that is running late (through CPython's
+    PyThreadState_SetAsyncExc).  A thread blocked in C code (e.g. sleep)
+    only sees the exception when it returns to Python, and without ctypes
+    the timeout is only noticed when the call finishes, as TimeoutFunction
+    did without SIGALRM.
+    """
+    def __init__(self):
+        self.local = threading.local()
+        # Threads under a deadline take the lock with a plain with statement,
+        # which the watchdog's exception cannot interrupt half way
+        self.lock = threading.Lock()
+        self.condition = threading.Condition(self.lock)
+        self.active = []
+        self.watchdog = None
+
+    def getStack(self):
+        stack = getattr(self.local, 'stack', None)
+        if stack is None:
+            stack = self.local.stack = []
+        return stack
+
+    def start(self, deadline):
+        "Starts watching deadline, a Deadline of the calling thread."
+        self.getStack().append(deadline)
+        if _setAsyncExc is not None:
+            with self.lock:
+                self.active.append(deadline)
+                if self.watchdog is None:
+                    self.watchdog = threading.Thread(target=self.watch, name='DeadlineService watchdog')
+                    self.watchdog.daemon = True
+                    self.watchdog.start()
+                self.condition.notify()
+
+    def finish(self, deadline):
+        """
+        Stops watching deadline and the deadlines started after it in its
+        thread, and pops them.  Returns whether deadline expired.  Calling it
+        again for the same deadline does nothing.
+        """
+        stack = self.getStack()
+        index = stack.index(deadline) if deadline in stack else len(stack)
+        finished = stack[index:] + [deadline]
+        while True:
+            try:
+                with self.lock:
+                    for d in finished:
+                        d.done = True
+                        if d in self.active:
+                            self.active.remove(d)
+                        if d.fired:
+                            # Drop the watchdog's exception if it has not been raised yet
+                            raiseInThread(d.threadId, None)
+                break
+            except TimeoutFunctionException:
+                # It was raised in here; the loop finishes the cleanup
+                pass
+        del stack[index:]
+        return deadline.fired or deadline.isExpired()
+
+    def getTimeLeft(self):
+        "Seconds until the calling thread's earliest deadline, or inf."
+        stack = getattr(self.local, 'stack', None)
+        if not stack:
+            return float('inf')
+        return min(deadline.expiry for deadline in stack) - time.monotonic()
+
+    def watch(self):
+        with self.condition:
+            while True:
+                waiting = [deadline for deadline in self.active if not deadline.fired]
+                if not waiting:
+                    self.condition.wait()
+                    continue
+                earliest = min(waiting, key=lambda deadline: deadline.expiry)
+                timeLeft = earliest.getTimeLeft()
+                if timeLeft > 0:
+                    self.condition.wait(timeLeft)
+                    continue
+                # Fire once per thread: the outer deadlines of a thread that
+                # is already unwinding need no exception of their own
+                earliest.fired = True
+                if not any(d.fired and not d.done for d in self.active if d is not earliest and d.threadId == earliest.threadId):
+                    raiseInThread(earliest.threadId, TimeoutFunctionException)
+
+DEADLINES = DeadlineService()
+
+def getTimeLeft():
+    """
+    Seconds left before the innermost running timeout (TimeoutFunction) of
+    the calling thread expires, or inf if there is none.  Agents can use it
+    to size their search.
+    """
+    return DEADLINES.getTimeLeft()
+
+def checkTimeout():
+    "Raises TimeoutFunctionException if a timeout of the calling thread has expired."
+    if DEADLINES.getTimeLeft() <= 0:
+        raise TimeoutFunctionException()
 
 class TimeoutFunction:
+    """
+    Wraps function so that calling it raises TimeoutFunctionException if it
+    runs for more than timeout seconds (a float).  Timeouts may be nested and
+    used from any thread; see DeadlineService.
+    """
     def __init__(self, function, timeout):
         self.timeout = timeout
         self.function = function
 
-    def handle_timeout(self, signum, frame):
-        raise TimeoutFunctionException()
-
     def __call__(self, *args, **keyArgs):
-        # If we have SIGALRM signal, use it to cause an exception if and
-        # when this function runs too long.  Otherwise check the time taken
-        # after the method has returned, and throw an exception then.
-        if hasattr(signal, 'SIGALRM'):
-            old = signal.signal(signal.SIGALRM, self.handle_timeout)
-            signal.alarm(self.timeout)
+        deadline = Deadline(self.timeout, threading.get_ident())
+        try:
             try:
+                DEADLINES.start(deadline)
                 result = self.function(*args, **keyArgs)
             finally:
-                signal.signal(signal.SIGALRM, old)
-            signal.alarm(0)
-        else:
-            startTime = time.time()
-            result = self.function(*args, **keyArgs)
-            timeElapsed = time.time() - startTime
-            if timeElapsed >= self.timeout:
-                self.handle_timeout(None, None)
+                expired = DEADLINES.finish(deadline)
+        except TimeoutFunctionException:
+            # The watchdog's exception may arrive before finish has run
+            DEADLINES.finish(deadline)
+            raise
+        if expired:
+            raise TimeoutFunctionException()
         return result
 
 
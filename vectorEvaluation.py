@@ -0,0 +1,171 @@
+# vectorEvaluation.py
+# -------------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Evaluates many GameStates at once with NumPy.
+
+A StateBatch turns a list of states that share a layout into arrays (Pacman
+and ghost positions, scared timers, food and capsule masks, scores), and
+computes food, ghost and capsule distance features for all of them in a few
+array operations.  The *Batch evaluation functions below return the same
+values as their per-state counterparts in multiAgents.py.
+
+NumPy is optional: check NUMPY_AVAILABLE before using this module.
+"""
+try:
+    import numpy
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+_LAYOUT_ARRAYS_CACHE = {}
+
+class LayoutArrays:
+    """
+    Per-layout index arrays shared by every batch on that layout: the cell
+    index (x * height + y) and coordinates of every cell that starts with
+    food, the starting capsules, and the maze distance matrix.
+    """
+    def __init__(self, layout):
+        self.height = layout.height
+        self.numCells = layout.width * layout.height
+        self.numBytes = (self.numCells + 7) // 8
+        foodCells = layout.food.asList()
+        self.foodIndices = numpy.array([x * self.height + y for x, y in foodCells], dtype=numpy.intp)
+        self.foodXY = numpy.array(foodCells, dtype=float).reshape(-1, 2)
+        self.capsules = list(layout.capsules)
+        self.capsuleXY = numpy.array(self.capsules, dtype=float).reshape(-1, 2)
+        self.layout = layout
+        self._mazeDistances = None
+
+    def getMazeDistances(self):
+        "Returns (cellIds, distances) of the layout's DistanceTable as arrays."
+        if self._mazeDistances is None:
+            table = self.layout.getDistanceTable()
+            cellIds = numpy.asarray(table.cellIds, dtype=numpy.intp)
+            distances = numpy.asarray(table.distances, dtype=float).reshape(table.numCells, table.numCells)
+            distances[distances == table.UNREACHABLE] = numpy.inf
+            self._mazeDistances = (cellIds, distances)
+        return self._mazeDistances
+
+def getLayoutArrays(layout):
+    key = "\n".join(layout.layoutText)
+    arrays = _LAYOUT_ARRAYS_CACHE.get(key)
+    if arrays is None:
+        arrays = _LAYOUT_ARRAYS_CACHE[key] = LayoutArrays(layout)
+    return arrays
+
+class StateBatch:
+    """
+    Array form of a list of GameStates on the same layout with the same
+    number of agents.  Row i of every array describes states[i].
+    """
+    def __init__(self, states):
+        data = [state.data for state in states]
+        self.arrays = arrays = getLayoutArrays(data[0].layout)
+        self.size = len(states)
+        self.pacmanXY = numpy.array([d.agentStates[0].configuration.pos for d in data], dtype=float)
+        self.ghostXY = numpy.array([[g.configuration.pos for g in d.agentStates[1:]] for d in data],
+                                   dtype=float).reshape(self.size, -1, 2)
+        self.scaredTimers = numpy.array([[g.scaredTimer for g in d.agentStates[1:]] for d in data],
+                                        dtype=float).reshape(self.size, -1)
+        self.scores = numpy.array([d.score for d in data], dtype=float)
+        self.isWin = numpy.array([d._win for d in data], dtype=bool)
+        self.isLose = numpy.array([d._lose for d in data], dtype=bool)
+        # Food bitboards -> one row of bits per state, keeping only food cells
+        packed = b''.join([d.food.bits.to_bytes(arrays.numBytes, 'little') for d in data])
+        bits = numpy.unpackbits(numpy.frombuffer(packed, dtype=numpy.uint8).reshape(self.size, arrays.numBytes),
+                                axis=1, bitorder='little')
+        self.foodMask = bits[:, arrays.foodIndices].astype(bool)
+        self.capsuleMask = numpy.array([[c in d.capsules for c in arrays.capsules] for d in data],
+                                       dtype=bool).reshape(self.size, -1)
+
+    def _distances(self, fromXY, toXY, metric):
+        """
+        Distances between each row's fromXY (n, 2) and the points toXY, which
+        are either shared (m, 2) or per row (n, m, 2).  Returns (n, m).
+        """
+        if toXY.ndim == 2:
+            toXY = toXY[numpy.newaxis, :, :]
+        delta = toXY - fromXY[:, numpy.newaxis, :]
+        if metric == 'manhattan':
+            return numpy.abs(delta).sum(axis=2)
+        if metric == 'euclidean':
+            return numpy.hypot(delta[:, :, 0], delta[:, :, 1])
+        if metric == 'maze':
+            cellIds, distances = self.arrays.getMazeDistances()
+            height = self.arrays.height
+            def cells(xy):
+                rounded = numpy.floor(xy + 0.5).astype(numpy.intp)
+                return cellIds[rounded[..., 0] * height + rounded[..., 1]]
+            toCells = numpy.broadcast_to(cells(toXY), (self.size, toXY.shape[1]))
+            return distances[cells(fromXY)[:, numpy.newaxis], toCells]
+        raise Exception('Unknown distance metric ' + str(metric))
+
+    def foodDistances(self, metric='manhattan', foodMask=None):
+        "(n, food cells) distances from Pacman, inf where there is no food."
+        mask = self.foodMask if foodMask is None else foodMask
+        distances = self._distances(self.pacmanXY, self.arrays.foodXY, metric)
+        return numpy.where(mask, distances, numpy.inf)
+
+    def minFoodDistance(self, metric='manhattan', foodMask=None):
+        "Distance to the closest food, or inf when there is none."
+        distances = self.foodDistances(metric, foodMask)
+        if distances.shape[1] == 0:
+            return numpy.full(self.size, numpy.inf)
+        return distances.min(axis=1)
+
+    def ghostDistances(self, metric='manhattan'):
+        "(n, ghosts) distances from Pacman to each ghost."
+        return self._distances(self.pacmanXY, self.ghostXY, metric)
+
+    def capsuleCounts(self):
+        return self.capsuleMask.sum(axis=1)
+
+    def minCapsuleDistance(self, metric='manhattan'):
+        "Distance to the closest remaining capsule, or inf when there is none."
+        if self.capsuleMask.shape[1] == 0:
+            return numpy.full(self.size, numpy.inf)
+        distances = self._distances(self.pacmanXY, self.arrays.capsuleXY, metric)
+        return numpy.where(self.capsuleMask, distances, numpy.inf).min(axis=1)
+
+def scoreEvaluationBatch(states):
+    "Batch form of multiAgents.scoreEvaluationFunction."
+    return numpy.array([state.data.score for state in states], dtype=float)
+
+def betterEvaluationBatch(states):
+    "Batch form of multiAgents.betterEvaluationFunction."
+    batch = StateBatch(states)
+    minFoodDist = batch.minFoodDistance('manhattan')
+    minFoodDist[numpy.isinf(minFoodDist)] = 0
+    ghostDistances = batch.ghostDistances('manhattan')
+    distancesToGhosts = ghostDistances.sum(axis=1)
+    proximityToGhosts = (ghostDistances <= 1).sum(axis=1)
+    return (batch.scores +
+            (1 / (minFoodDist + 1)) -
+            (1 / (distancesToGhosts + 1)) -
+            proximityToGhosts -
+            batch.capsuleCounts())
+
+def reflexEvaluationBatch(currentGameState, successors):
+    """
+    Batch form of ReflexAgent.evaluationFunction for the successors of
+    currentGameState: the distance to the closest ghost in the successor
+    over one plus the distance to the closest food of the current state.
+    """
+    batch = StateBatch(successors)
+    currentFood = StateBatch([currentGameState]).foodMask
+    ghostDist = batch.ghostDistances('euclidean').min(axis=1)
+    foodDist = batch.minFoodDistance('euclidean', numpy.broadcast_to(currentFood, batch.foodMask.shape))
+    return ghostDist / (foodDist + 1)